@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,12 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings():
+    from core.testing import TEST_SETTINGS
+    from django.test.utils import override_settings
+
+    with override_settings(**TEST_SETTINGS):
+        yield
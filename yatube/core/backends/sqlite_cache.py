@@ -0,0 +1,252 @@
+"""Cache backend shared by all worker processes of a host.
+
+Entries live in a SQLite database in WAL mode, so any number of processes
+read concurrently while a writer appends to the log. Reads go through a
+memory-mapped view of the file. Expired rows are dropped lazily, and the
+least recently used ones are culled when the table grows over
+``MAX_ENTRIES``.
+
+Usage::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "core.backends.sqlite_cache.SQLiteCache",
+            "LOCATION": "/var/tmp/yatube-cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+# Reads refresh the LRU timestamp only when it is older than this,
+# so hot keys don't turn every read into a write.
+ACCESS_RESOLUTION = 1.0
+# How many writes of a process pass between two size checks.
+CULL_EVERY = 100
+MMAP_SIZE = 64 * 1024 * 1024
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are neither shared between threads nor inherited by
+        # forked workers.
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            connection.executescript(SCHEMA)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self):
+        """Transaction holding the database write lock from the start."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _prepare(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_accessed(self, keys, now):
+        with self._write() as connection:
+            connection.executemany(
+                "UPDATE cache SET accessed = ? WHERE key = ?",
+                [(now, key) for key in keys],
+            )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        prepared = {self._prepare(key, version): key for key in keys}
+        if not prepared:
+            return {}
+
+        now = time.time()
+        placeholders = ", ".join("?" * len(prepared))
+        rows = self._connection().execute(
+            "SELECT key, value, expires, accessed FROM cache "
+            f"WHERE key IN ({placeholders})",
+            list(prepared),
+        )
+        result = {}
+        stale = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            result[prepared[key]] = pickle.loads(value)
+            if now - accessed > ACCESS_RESOLUTION:
+                stale.append(key)
+        if stale:
+            self._touch_accessed(stale, now)
+        return result
+
+    def _store(self, connection, key, value, timeout, now):
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                key,
+                pickle.dumps(value, self.pickle_protocol),
+                self.get_backend_timeout(timeout),
+                now,
+            ),
+        )
+
+    def _wrote(self, count=1):
+        self._writes += count
+        if self._writes >= CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as connection:
+            for key, value in data.items():
+                key = self._prepare(key, version)
+                self._store(connection, key, value, timeout, now)
+        self._wrote(len(data))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare(key, version)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now)
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    key,
+                    pickle.dumps(value, self.pickle_protocol),
+                    self.get_backend_timeout(timeout),
+                    now,
+                ),
+            )
+            added = cursor.rowcount == 1
+        if added:
+            self._wrote()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._prepare(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                "UPDATE cache SET value = ?, accessed = ? WHERE key = ?",
+                (pickle.dumps(value, self.pickle_protocol), now, key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                "UPDATE cache SET expires = ?, accessed = ? "
+                "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (self.get_backend_timeout(timeout), now, key, now),
+            )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._prepare(key, version)
+        row = (
+            self._connection()
+            .execute(
+                "SELECT 1 FROM cache WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._prepare(key, version) for key in keys]
+        with self._write() as connection:
+            connection.executemany(
+                "DELETE FROM cache WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute("DELETE FROM cache")
+
+    def _cull(self):
+        with self._write() as connection:
+            connection.execute(
+                "DELETE FROM cache WHERE expires <= ?", (time.time(),)
+            )
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM cache"
+            ).fetchone()
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute("DELETE FROM cache")
+                return
+            connection.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (count // self._cull_frequency,),
+            )
+
+    def close(self, **kwargs):
+        # Connections are kept open for the lifetime of the worker.
+        pass
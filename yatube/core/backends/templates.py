@@ -0,0 +1,30 @@
+"""Django template engine reporting render time to ``core.timing``.
+
+Usage::
+
+    TEMPLATES = [
+        {
+            "BACKEND": "core.backends.templates.TimedDjangoTemplates",
+            ...
+        }
+    ]
+"""
+from django.template.backends.django import DjangoTemplates, Template
+
+from .. import timing
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timing.phase("template"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self
+        )
@@ -0,0 +1,107 @@
+"""sorl-thumbnail backend counting generated thumbnails in ``core.metrics``.
+
+``get_cached`` looks a thumbnail up without creating it and
+``get_thumbnails`` creates several from one decoded source, see
+``core.thumbnails``.
+
+Usage::
+
+    THUMBNAIL_BACKEND = "core.backends.thumbnail.ThumbnailBackend"
+"""
+import logging
+import time
+
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile
+
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    def _fill_options(self, source, options: dict) -> dict:
+        # As get_thumbnail() does, so the names match.
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """The would-be thumbnail, named like ``get_thumbnail`` names it."""
+        source = ImageFile(file_)
+        options = self._fill_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached(self, file_, geometry_string, **options):
+        """The thumbnail if the key-value store knows it, else None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def get_thumbnails(self, file_, variants) -> list:
+        """``get_thumbnail`` of each ``(geometry, options)`` of *variants*.
+
+        The source is decoded once for all the missing thumbnails. Returns
+        the thumbnails in order, or an empty list if the source is broken.
+        """
+        source = ImageFile(file_)
+        thumbnails = []
+        missing = []
+        for geometry_string, options in variants:
+            options = self._fill_options(source, dict(options))
+            thumbnail = ImageFile(
+                self._get_thumbnail_filename(source, geometry_string, options),
+                default.storage,
+            )
+            cached = default.kvstore.get(thumbnail)
+            thumbnails.append(cached or thumbnail)
+            if cached is None:
+                missing.append((geometry_string, options, thumbnail))
+        if not missing:
+            return thumbnails
+
+        try:
+            source_image = default.engine.get_image(source)
+        except Exception:
+            logger.exception("Can't read the image %s", source.name)
+            return []
+        try:
+            image_info = default.engine.get_image_info(source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            for geometry_string, options, thumbnail in missing:
+                if not settings.THUMBNAIL_FORCE_OVERWRITE and (
+                    thumbnail.exists()
+                ):
+                    continue
+                options["image_info"] = image_info
+                self._create_thumbnail(
+                    source_image, geometry_string, options, thumbnail
+                )
+        finally:
+            default.engine.cleanup(source_image)
+        default.kvstore.get_or_set(source)
+        for _, _, thumbnail in missing:
+            default.kvstore.set(thumbnail, source)
+        return thumbnails
+
+    def _create_thumbnail(
+        self, source_image, geometry_string, options, thumbnail
+    ):
+        started = time.perf_counter()
+        super()._create_thumbnail(
+            source_image, geometry_string, options, thumbnail
+        )
+        metrics.observe(
+            "yatube_thumbnail_generation_seconds",
+            time.perf_counter() - started,
+            metrics.SECONDS_BUCKETS,
+        )
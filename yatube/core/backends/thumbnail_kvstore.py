@@ -0,0 +1,124 @@
+"""sorl-thumbnail key-value store with an in-process LRU.
+
+sorl's ``cached_db`` store answers from the shared cache and falls back to
+its table, one lookup per thumbnail. This store keeps the image entries it
+has found in a bounded LRU of the worker (``THUMBNAIL_LRU_SIZE`` entries,
+each for at most ``THUMBNAIL_LRU_TIMEOUT`` seconds), writes new thumbnails
+through all three tiers, and ``prefetch`` loads the entries of a whole page
+with one cache and one database query.
+
+Misses are not kept locally, so a thumbnail created by another worker is
+seen at once. Entries removed by another worker (a deleted or replaced
+image) may outlive their row here until they time out; they point to names
+pages no longer show. Overriding ``MEDIA_ROOT`` (tests) empties the LRU.
+
+Usage::
+
+    THUMBNAIL_KVSTORE = "core.backends.thumbnail_kvstore.KVStore"
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+_stores = []
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def __init__(self):
+        super().__init__()
+        # Raw key -> (expiry, raw value), least recently used first.
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        _stores.append(self)
+
+    def _is_local(self, key: str) -> bool:
+        # Lists of thumbnails are read-modify-written, keep them shared.
+        return key.startswith(add_prefix("", "image"))
+
+    def _local_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _local_set(self, key: str, value) -> None:
+        if value in (None, cached_db_kvstore.EMPTY_VALUE):
+            return
+        if not self._is_local(key):
+            return
+        expiry = time.monotonic() + settings.THUMBNAIL_LRU_TIMEOUT
+        with self._lock:
+            self._local[key] = (expiry, value)
+            self._local.move_to_end(key)
+            while len(self._local) > settings.THUMBNAIL_LRU_SIZE:
+                self._local.popitem(last=False)
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        """Load the raw *keys* missing locally in two queries at most."""
+        missing = [key for key in keys if self._local_get(key) is None]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        unknown = [key for key in missing if key not in found]
+        if unknown:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=unknown).values_list(
+                    "key", "value"
+                )
+            )
+            self.cache.set_many(
+                {
+                    key: rows.get(key, cached_db_kvstore.EMPTY_VALUE)
+                    for key in unknown
+                },
+                sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            found.update(rows)
+        for key, value in found.items():
+            self._local_set(key, value)
+
+    def _get_raw(self, key):
+        value = self._local_get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            self._local_set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._local_set(key, value)
+
+    def _delete_raw(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        super()._delete_raw(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        self.clear_local()
+        super().clear(delete_thumbnails)
+
+
+@receiver(setting_changed)
+def media_root_changed(setting, **kwargs):
+    if setting == "MEDIA_ROOT":
+        for store in _stores:
+            store.clear_local()
@@ -0,0 +1,189 @@
+"""Two-tier cache: an in-process LRU in front of a shared backend.
+
+Hot keys are answered from the worker's memory; everything else falls
+through to the cache named by ``LOCATION``. Local entries live at most
+``L1_TIMEOUT`` seconds, which bounds how long another worker's write
+(e.g. a generation bump of ``core.caching``) stays unnoticed. Writes of
+this worker update both tiers at once. Calls are timed as the "cache"
+phase of ``core.timing``, and lookups are counted in ``core.metrics`` by
+key prefix.
+
+Usage::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "core.backends.tiered_cache.TieredCache",
+            "LOCATION": "shared",
+            "OPTIONS": {"L1_TIMEOUT": 2, "L1_MAX_ENTRIES": 1000},
+        },
+        "shared": {...},
+    }
+"""
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .. import metrics, timing
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = location
+        self._l1_timeout = int(options.get("L1_TIMEOUT", 2))
+        self._l1 = LocMemCache(
+            f"tiered-{location}",
+            {
+                "TIMEOUT": self._l1_timeout,
+                "OPTIONS": {
+                    "MAX_ENTRIES": options.get("L1_MAX_ENTRIES", 1000)
+                },
+            },
+        )
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def _l2(self) -> BaseCache:
+        return caches[self._l2_alias]
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            self._stats.update(deltas)
+
+    def stats(self) -> dict:
+        """Hits and misses of each tier in this process."""
+        with self._stats_lock:
+            return {
+                name: self._stats[name]
+                for name in ("l1_hits", "l1_misses", "l2_hits", "l2_misses")
+            }
+
+    def _l1_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def _key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = self.get_many([key], version=version).get(key, sentinel)
+        return default if value is sentinel else value
+
+    @timing.timed("cache")
+    def get_many(self, keys, version=None):
+        local_keys = {self._key(key, version): key for key in keys}
+        found = {
+            local_keys[local_key]: value
+            for local_key, value in self._l1.get_many(
+                local_keys, version=0
+            ).items()
+        }
+        missing = [key for key in local_keys.values() if key not in found]
+        self._count(l1_hits=len(found), l1_misses=len(missing))
+        if missing:
+            fetched = self._l2.get_many(missing, version=version)
+            self._count(
+                l2_hits=len(fetched), l2_misses=len(missing) - len(fetched)
+            )
+            if fetched:
+                self._l1.set_many(
+                    {
+                        self._key(key, version): value
+                        for key, value in fetched.items()
+                    },
+                    self._l1_timeout,
+                    version=0,
+                )
+            found.update(fetched)
+        timing.count(
+            cache_hits=len(found), cache_misses=len(local_keys) - len(found)
+        )
+        for key in local_keys.values():
+            metrics.inc(
+                "yatube_cache_requests_total",
+                prefix=metrics.cache_prefix(key),
+                result="hit" if key in found else "miss",
+            )
+        return found
+
+    @timing.timed("cache")
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        self._l1.set(
+            self._key(key, version),
+            value,
+            self._l1_timeout_for(timeout),
+            version=0,
+        )
+
+    @timing.timed("cache")
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2.set_many(data, timeout, version=version)
+        self._l1.set_many(
+            {
+                self._key(key, version): value
+                for key, value in data.items()
+                if key not in failed
+            },
+            self._l1_timeout_for(timeout),
+            version=0,
+        )
+        return failed
+
+    @timing.timed("cache")
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1.set(
+                self._key(key, version),
+                value,
+                self._l1_timeout_for(timeout),
+                version=0,
+            )
+        return added
+
+    @timing.timed("cache")
+    def incr(self, key, delta=1, version=None):
+        value = self._l2.incr(key, delta, version=version)
+        self._l1.set(self._key(key, version), value, version=0)
+        return value
+
+    @timing.timed("cache")
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    @timing.timed("cache")
+    def has_key(self, key, version=None):
+        return self._l1.has_key(
+            self._key(key, version), version=0
+        ) or self._l2.has_key(key, version=version)
+
+    @timing.timed("cache")
+    def delete(self, key, version=None):
+        self._l1.delete(self._key(key, version), version=0)
+        self._l2.delete(key, version=version)
+
+    @timing.timed("cache")
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._l1.delete_many(
+            [self._key(key, version) for key in keys], version=0
+        )
+        self._l2.delete_many(keys, version=version)
+
+    @timing.timed("cache")
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
@@ -0,0 +1,132 @@
+"""Bulk inserts streamed in memory-bounded chunks.
+
+``QuerySet.bulk_create`` turns its argument into a list first and takes an
+explicit ``batch_size`` literally, which SQLite rejects above 500 rows per
+statement. The helpers below consume any iterable chunk by chunk and let
+the backend pick the statement size.
+"""
+import itertools
+from typing import Iterable, Iterator, List, Sequence
+
+from django.db import connections, models, router
+from django.db.models import QuerySet
+
+CHUNK_SIZE = 1000
+
+
+def chunks(iterable: Iterable, size: int = CHUNK_SIZE) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_create(
+    model, objs: Iterable[models.Model], chunk_size: int = CHUNK_SIZE, **kwargs
+) -> int:
+    """``bulk_create`` *objs* chunk by chunk, return how many were sent."""
+    count = 0
+    for chunk in chunks(objs, chunk_size):
+        model.objects.bulk_create(chunk, **kwargs)
+        count += len(chunk)
+    return count
+
+
+def insert_rows(
+    model,
+    fields: Sequence[str],
+    rows: Iterable[tuple],
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """Insert *rows* of database values of *fields* into *model*'s table.
+
+    No model instances are built and no signals are sent, which makes it
+    several times faster than ``bulk_create`` for generated data. Columns
+    not listed in *fields* get the default of their field. Returns the
+    number of inserted rows.
+    """
+    meta = model._meta
+    connection = connections[router.db_for_write(model)]
+    given = [meta.get_field(name) for name in fields]
+    rest = [
+        field
+        for field in meta.concrete_fields
+        if field not in given and not isinstance(field, models.AutoField)
+    ]
+    tail = tuple(
+        field.get_db_prep_save(field.get_default(), connection)
+        for field in rest
+    )
+    table = connection.ops.quote_name(meta.db_table)
+    columns = ", ".join(
+        connection.ops.quote_name(field.column) for field in given + rest
+    )
+
+    count = 0
+    with connection.cursor() as cursor:
+        for chunk in chunks(rows, chunk_size):
+            chunk = [row + tail for row in chunk]
+            if connection.vendor == "postgresql":
+                # executemany() costs a round trip per row on psycopg2.
+                from psycopg2.extras import execute_values
+
+                execute_values(
+                    cursor.cursor,
+                    f"INSERT INTO {table} ({columns}) VALUES %s",
+                    chunk,
+                    page_size=len(chunk),
+                )
+            else:
+                placeholders = ", ".join(["%s"] * len(chunk[0]))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) "
+                    f"VALUES ({placeholders})",
+                    chunk,
+                )
+            count += len(chunk)
+    return count
+
+
+def insert_select(
+    model,
+    fields: Sequence[str],
+    queryset: QuerySet,
+    ignore_conflicts: bool = False,
+) -> int:
+    """Insert the rows *queryset* selects into *fields* of *model*'s table.
+
+    Runs a single ``INSERT ... SELECT`` on the database *model* is written
+    to, so the rows come from the data the statement sees rather than
+    from a snapshot read earlier. *queryset* must select the values of
+    *fields* in order, e.g. with ``values_list``. Returns the number of
+    inserted rows.
+    """
+    meta = model._meta
+    using = router.db_for_write(model)
+    connection = connections[using]
+    select, params = queryset.order_by().query.get_compiler(using).as_sql()
+    table = connection.ops.quote_name(meta.db_table)
+    columns = ", ".join(
+        connection.ops.quote_name(meta.get_field(name).column)
+        for name in fields
+    )
+    sql = " ".join(
+        filter(
+            None,
+            (
+                connection.ops.insert_statement(
+                    ignore_conflicts=ignore_conflicts
+                ),
+                f"{table} ({columns})",
+                select,
+                connection.ops.ignore_conflicts_suffix_sql(
+                    ignore_conflicts=ignore_conflicts
+                ),
+            ),
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
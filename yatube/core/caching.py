@@ -0,0 +1,210 @@
+"""Versioned cache keys invalidated by generation counters.
+
+Every cached value depends on one or more *namespaces* (``"posts"``,
+``"timeline:42"``...). Each namespace has a generation counter stored in
+the cache; it is part of the keys built by ``make_key`` and writes bump it,
+so stale entries are never read again and simply expire. Bumps also move
+a per-namespace "last modified" watermark used for conditional GET. Every
+key also depends on a namespace of the release (``CACHE_VERSION``, a
+digest of the templates by default), which a deploy replaces by a fresh
+one, so new code never serves pages and fragments rendered by the old.
+Values computed within ``REPLICA_STICKY_SECONDS`` of a bump are read from
+the primary (``db_router.primary``), so a lagging replica can't fill the
+new generation with old rows; later fills read the replicas.
+"""
+import hashlib
+import os
+import time
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Any, Callable, ContextManager, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.template import engines
+
+from .db_router import primary
+
+GENERATION_PREFIX = "generation"
+MODIFIED_PREFIX = "modified"
+# Bounds how long a crashed worker keeps others on a stale value.
+LOCK_TIMEOUT = 30
+
+
+@lru_cache(maxsize=None)
+def _templates_digest() -> str:
+    digest = hashlib.md5()
+    for engine in engines.all():
+        for directory in getattr(engine, "template_dirs", ()):
+            for root, dirs, files in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    digest.update(path[len(directory):].encode())
+                    with open(path, "rb") as file:
+                        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _with_release(namespaces: Iterable[str]) -> list:
+    release = settings.CACHE_VERSION or _templates_digest()
+    return [*namespaces, f"release:{release}"]
+
+
+def _generation_key(namespace: str) -> str:
+    return f"{GENERATION_PREFIX}:{namespace}"
+
+
+def _initial_generation() -> int:
+    # A fresh, time based value keeps an evicted counter from restarting
+    # at a number whose entries may still be in the cache.
+    return time.time_ns() // 1000
+
+
+def generations(namespaces: Iterable[str]) -> list:
+    """Current generations of *namespaces* and the release, in order."""
+    keys = [
+        _generation_key(namespace) for namespace in _with_release(namespaces)
+    ]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def last_modified(namespaces: Iterable[str]) -> float:
+    """Timestamp of the latest bump of any of *namespaces* or the release."""
+    keys = [
+        f"{MODIFIED_PREFIX}:{namespace}"
+        for namespace in _with_release(namespaces)
+    ]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Unknown (or evicted) watermarks start now: a later write
+            # can't be missed, at worst clients refetch an unchanged page.
+            cache.add(key, time.time(), None)
+            found[key] = cache.get(key)
+    return max(found.values())
+
+
+def reads_after(modified: float) -> ContextManager:
+    """Route the reads of a value whose data last changed at *modified*.
+
+    Replicas may lag behind a change for ``REPLICA_STICKY_SECONDS``, so
+    meanwhile the value is read from the primary.
+    """
+    if (
+        settings.DATABASE_REPLICAS
+        and time.time() - modified < settings.REPLICA_STICKY_SECONDS
+    ):
+        return primary()
+    return nullcontext()
+
+
+def fill_reads(namespaces: Iterable[str]) -> ContextManager:
+    """Route the reads of a value cached under *namespaces*."""
+    if not settings.DATABASE_REPLICAS:
+        return nullcontext()
+    return reads_after(last_modified(namespaces))
+
+
+def _bump(namespaces: Iterable[str]) -> None:
+    now = time.time()
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+    cache.set_many(
+        {f"{MODIFIED_PREFIX}:{namespace}": now for namespace in namespaces},
+        None,
+    )
+
+
+def bump(*namespaces: str) -> None:
+    """Invalidate everything cached under *namespaces*.
+
+    Inside a transaction the counters are bumped again after commit, so a
+    request that read the old rows meanwhile can't pin them under the new
+    generation.
+    """
+    _bump(namespaces)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _digest(parts: Iterable) -> str:
+    return hashlib.md5(
+        ":".join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def make_key(name: str, namespaces: Iterable[str], *vary_on) -> str:
+    """Cache key for *name* bound to the generations of *namespaces*.
+
+    The key reads ``name:<vary_on digest>:<generations digest>``, so all
+    generations of one entry share the prefix used by ``single_flight``.
+    """
+    return f"{name}:{_digest(vary_on)}:{_digest(generations(namespaces))}"
+
+
+def _stale_key(key: str) -> str:
+    return f"stale:{key.rsplit(':', 1)[0]}"
+
+
+def single_flight(
+    key: str, compute: Callable[[], Any], namespaces: Iterable[str] = ()
+) -> Any:
+    """Cached value of *key*, recomputed by one caller at a time.
+
+    The first caller to miss *key* takes a lock and recomputes it, the
+    others meanwhile get the previous generation of the value instead of
+    hitting the database all at once. Only a cold cache, with no previous
+    value to serve, is computed by every caller. *namespaces* are those
+    *key* was made for, see ``fill_reads``.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"lock:{key}"
+    stale_key = _stale_key(key)
+    if not cache.add(lock_key, True, LOCK_TIMEOUT):
+        value = cache.get(stale_key)
+        if value is not None:
+            return value
+        return compute()
+
+    try:
+        with fill_reads(namespaces):
+            value = compute()
+        timeout = settings.VERSIONED_CACHE_TIMEOUT
+        cache.set(key, value, timeout)
+        # The stale copy outlives the entry, so expiration is covered too.
+        cache.set(stale_key, value, None if timeout is None else timeout * 2)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def get_or_set(
+    name: str, namespaces: Iterable[str], default: Callable[[], Any], *vary_on
+) -> Any:
+    """Cached result of *default* bound to the generations of *namespaces*."""
+
+    def compute():
+        with fill_reads(namespaces):
+            return default()
+
+    return cache.get_or_set(
+        make_key(name, namespaces, *vary_on),
+        compute,
+        settings.VERSIONED_CACHE_TIMEOUT,
+    )
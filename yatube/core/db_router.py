@@ -0,0 +1,94 @@
+"""Reads from replicas, writes to the primary, read-your-writes for users.
+
+``ReplicaRouter`` sends the reads of a request to a random alias of
+``DATABASE_REPLICAS`` and every write to ``default``. Once a request
+routes a write, its remaining reads go to the primary too. If the primary
+actually ran an INSERT, UPDATE or DELETE (``get_or_create`` of an existing
+row does not count), ``core.middleware.replicas.ReplicaRoutingMiddleware``
+sets a cookie that keeps the client's reads on the primary for
+``REPLICA_STICKY_SECONDS``, long enough for the replicas to catch up.
+Reads outside of requests (commands, background tasks) always go to the
+primary.
+
+Reads that fill the version-keyed caches of ``core.caching`` within
+``REPLICA_STICKY_SECONDS`` of a generation bump run under ``primary()``:
+a lagging replica would otherwise store pre-write rows under the new
+generation for ``VERSIONED_CACHE_TIMEOUT``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+class RoutingState:
+    def __init__(self, pinned: bool = False):
+        # Reads go to the primary.
+        self.pinned = pinned
+        # The primary has changed rows for the request.
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """``execute_wrapper`` of the primary, notes the writes."""
+        if not self.wrote and sql.lstrip().upper().startswith(WRITES):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+_state: ContextVar[Optional[RoutingState]] = ContextVar(
+    "routing_state", default=None
+)
+_primary: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
+
+@contextmanager
+def primary():
+    """Send the reads of the block to the primary."""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def activate(state: RoutingState):
+    return _state.set(state)
+
+
+def deactivate(token) -> None:
+    _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related rows come from where the instance came from.
+            return instance._state.db
+        state = _state.get()
+        if (
+            state is None
+            or state.pinned
+            or _primary.get()
+            or not settings.DATABASE_REPLICAS
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,86 @@
+"""View decorators serving anonymous pages from the cache."""
+import math
+import time
+from functools import wraps
+from typing import Callable, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+
+
+def _set_validators(response, etag: str, modified: Optional[int]) -> None:
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    patch_vary_headers(response, ["Cookie"])
+    patch_cache_control(response, no_cache=True)
+
+
+def anonymous_cache(namespaces: Callable[..., Sequence[str]]):
+    """Cache full GET responses for anonymous users and answer with 304.
+
+    *namespaces* is called with the view arguments and returns the
+    ``core.caching`` namespaces the page depends on. Their generations and
+    the full path make the ``ETag`` and their watermark, rounded up, the
+    ``Last-Modified`` header, so an unchanged page costs neither queries nor
+    rendering. Authenticated users get the view as is; ``Vary: Cookie``
+    keeps the two apart.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or request.user.is_authenticated
+            ):
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ["Cookie"])
+                return response
+
+            depends_on = namespaces(request, *args, **kwargs)
+            etag = quote_etag(
+                caching.make_key("page", depends_on, request.get_full_path())
+            )
+            modified_at = caching.last_modified(depends_on)
+            # HTTP dates have whole seconds: until the second of the last
+            # write is over, another write may share it, so clients validate
+            # with the ETag alone meanwhile.
+            modified = math.ceil(modified_at)
+            if time.time() < modified:
+                modified = None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is not None:
+                _set_validators(response, etag, modified)
+                return response
+
+            key = caching.make_key(
+                "response", depends_on, request.get_full_path()
+            )
+            response = cache.get(key)
+            if response is None:
+                # The cached page must not hold rows of a lagging replica.
+                with caching.reads_after(modified_at):
+                    response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    return response
+                cache.set(key, response, settings.VERSIONED_CACHE_TIMEOUT)
+            # A page cached within the second of the write gets its
+            # Last-Modified once that second is over.
+            _set_validators(response, etag, modified)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,166 @@
+"""Validation and normalization of uploaded images.
+
+``validate_upload`` checks an upload from its header alone: files cut at
+``UPLOAD_MAX_BYTES`` by ``core.uploads.CappedUploadHandler``, formats out
+of ``IMAGE_UPLOAD_FORMATS`` and images with more than
+``IMAGE_UPLOAD_MAX_PIXELS`` pixels are rejected before anything is decoded.
+
+``normalize`` runs when a form or serializer cleans an upload, before the
+file is stored, and checks the pixels again before decoding. It decodes
+in the request, so it takes at most ``IMAGE_NORMALIZE_MAX_PIXELS``, far
+fewer than the header cap: JPEGs count after draft decoding at a fraction
+of their size, other images over it are rejected. Images are
+turned upright by their EXIF orientation, scaled down to fit
+``IMAGE_UPLOAD_MAX_SIDE`` and re-encoded without metadata (the colour
+profile is kept unless the colour mode changes, see ``_convert``) as
+``IMAGE_UPLOAD_FORMAT``: progressive JPEG or WebP at
+``IMAGE_UPLOAD_QUALITY``. Images with transparency that JPEG can't hold
+become PNG; GIFs, which may be animated, are stored as uploaded.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from django.utils.functional import lazy
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+def _invalid_image_message() -> str:
+    return (
+        "Загрузите картинку JPEG, PNG, GIF или WebP не больше "
+        f"{filesizeformat(settings.UPLOAD_MAX_BYTES)}"
+    )
+
+
+INVALID_IMAGE_MESSAGE = lazy(_invalid_image_message, str)()
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def _output_format(alpha: bool) -> str:
+    format_ = settings.IMAGE_UPLOAD_FORMAT
+    if format_ == "WEBP" and not features.check("webp"):
+        format_ = "JPEG"
+    if format_ == "JPEG" and alpha:
+        format_ = "PNG"
+    return format_
+
+
+def _convert(image, mode: str, icc_profile):
+    """*image* in *mode* and the colour profile of its new pixels.
+
+    A profile describes the pixels of one mode, a CMYK one on RGB pixels
+    makes browsers show wrong colours. On a change of mode the pixels are
+    converted to sRGB, which browsers assume for untagged images, with
+    LittleCMS when Pillow has it, and the profile is dropped.
+    """
+    if image.mode == mode:
+        return image, icc_profile
+    if icc_profile and features.check("littlecms2"):
+        from PIL import ImageCms
+
+        try:
+            return (
+                ImageCms.profileToProfile(
+                    image,
+                    ImageCms.ImageCmsProfile(BytesIO(icc_profile)),
+                    ImageCms.createProfile("sRGB"),
+                    outputMode=mode,
+                ),
+                None,
+            )
+        except (ImageCms.PyCMSError, OSError, ValueError):
+            # A broken profile or a mode LittleCMS can't convert.
+            pass
+    return image.convert(mode), None
+
+
+def _too_many_pixels(limit: int) -> ValidationError:
+    return ValidationError(
+        "Картинка слишком большая: можно не больше %(limit)s пикселей",
+        code="too_many_pixels",
+        params={"limit": limit},
+    )
+
+
+def _check_pixels(image, limit: int) -> None:
+    if image.width * image.height > limit:
+        raise _too_many_pixels(limit)
+
+
+def open_image(file_):
+    """The image of *file_* with only its header read."""
+    file_.seek(0)
+    try:
+        image = Image.open(file_)
+    except Image.DecompressionBombError:
+        image = None
+    except OSError:
+        raise ValidationError(
+            "Не удалось прочитать картинку", code="invalid_image"
+        )
+    if image is None:
+        raise _too_many_pixels(settings.IMAGE_UPLOAD_MAX_PIXELS)
+    _check_pixels(image, settings.IMAGE_UPLOAD_MAX_PIXELS)
+    return image
+
+
+def validate_upload(file_) -> None:
+    """Reject a truncated, unsupported or oversize upload from its header."""
+    if getattr(file_, "truncated", False):
+        raise ValidationError(
+            "Файл слишком большой: можно не больше %(limit)s",
+            code="file_too_large",
+            params={"limit": filesizeformat(settings.UPLOAD_MAX_BYTES)},
+        )
+    image = open_image(file_)
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            "Картинки %(format)s не поддерживаются",
+            code="invalid_format",
+            params={"format": image.format},
+        )
+    file_.seek(0)
+
+
+def normalize(file_):
+    """The upload re-encoded for storage, see the module docstring."""
+    image = open_image(file_)
+    if image.format == "GIF":
+        file_.seek(0)
+        return file_
+
+    side = settings.IMAGE_UPLOAD_MAX_SIDE
+    # JPEG decodes at a fraction of the size when that is enough.
+    image.draft("RGB", (side, side))
+    _check_pixels(image, settings.IMAGE_NORMALIZE_MAX_PIXELS)
+    icc_profile = image.info.get("icc_profile")
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side), Image.LANCZOS)
+
+    alpha = _has_alpha(image)
+    format_ = _output_format(alpha)
+    image, icc_profile = _convert(
+        image, "RGBA" if alpha and format_ != "JPEG" else "RGB", icc_profile
+    )
+    params = {"optimize": True}
+    if format_ == "JPEG":
+        params.update(quality=settings.IMAGE_UPLOAD_QUALITY, progressive=True)
+    elif format_ == "WEBP":
+        params.update(quality=settings.IMAGE_UPLOAD_QUALITY, method=4)
+    if icc_profile:
+        params["icc_profile"] = icc_profile
+
+    buffer = BytesIO()
+    image.save(buffer, format_, **params)
+    name = os.path.splitext(os.path.basename(file_.name))[0]
+    return ContentFile(buffer.getvalue(), name=name + EXTENSIONS[format_])
@@ -0,0 +1,111 @@
+import datetime
+import pstats
+from collections import Counter, defaultdict
+from io import StringIO
+
+from core import profiling
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "List the slowest captured request profiles or aggregate them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--view", help="Only profiles of this view")
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Rows of each listing"
+        )
+        parser.add_argument(
+            "--aggregate",
+            action="store_true",
+            help="Merge the profiles instead of listing them",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=("cumulative", "tottime", "ncalls"),
+            default="cumulative",
+            help="Order of the merged cProfile statistics",
+        )
+
+    def handle(self, *args, **options):
+        store = profiling.ProfileStore(
+            settings.PROFILING_DIR, settings.PROFILING_MAX_FILES
+        )
+        captures = [
+            capture
+            for capture in store.load()
+            if options["view"] in (None, capture["view"])
+        ]
+        if not captures:
+            self.stdout.write("No profiles captured")
+            return
+        if options["aggregate"]:
+            self.aggregate(captures, options["limit"], options["sort"])
+        else:
+            self.list(captures, options["limit"])
+
+    def list(self, captures, limit):
+        captures = sorted(
+            captures, key=lambda capture: capture["duration_ms"], reverse=True
+        )
+        for capture in captures[:limit]:
+            created = datetime.datetime.fromtimestamp(capture["created"])
+            query = "&".join(
+                f"{key}={value}" for key, value in capture["query"].items()
+            )
+            self.stdout.write(
+                f"{capture['duration_ms']:9.1f} ms "
+                f"{created:%Y-%m-%d %H:%M:%S} "
+                f"{'cprofile' if capture['cprofile'] else 'sampled ':8} "
+                f"{capture['status']} {capture['view']} "
+                f"{capture['method']} {capture['path']}"
+                + (f"?{query}" if query else "")
+                + f"  [{capture['name']}]"
+            )
+
+    def aggregate(self, captures, limit, sort):
+        durations = defaultdict(list)
+        for capture in captures:
+            durations[capture["view"]].append(capture["duration_ms"])
+        self.stdout.write("Slow requests by view:")
+        for view, values in sorted(
+            durations.items(), key=lambda item: -sum(item[1])
+        ):
+            self.stdout.write(
+                f"  {view}: {len(values)} requests, "
+                f"mean {sum(values) / len(values):.1f} ms, "
+                f"max {max(values):.1f} ms"
+            )
+
+        # A frame counts once per sample however deep it recurses.
+        inclusive = Counter()
+        own = Counter()
+        samples = 0
+        for capture in captures:
+            for stack, count in capture["stacks"].items():
+                frames = stack.split(";")
+                samples += count
+                own[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+        if samples:
+            self.stdout.write(
+                f"\nSampled stacks ({samples} samples), "
+                "% of samples in and directly in each function:"
+            )
+            # Outer frames are in every sample, so rank by own samples.
+            for frame, count in own.most_common(limit):
+                self.stdout.write(
+                    f"  {inclusive[frame] / samples:6.1%} "
+                    f"{count / samples:6.1%}  {frame}"
+                )
+
+        paths = [capture["prof"] for capture in captures if capture["prof"]]
+        if paths:
+            self.stdout.write(f"\ncProfile of {len(paths)} requests:")
+            # pstats prints piecemeal, the output wrapper ends every piece.
+            output = StringIO()
+            stats = pstats.Stats(*paths, stream=output)
+            stats.sort_stats(sort).print_stats(limit)
+            self.stdout.write(output.getvalue())
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into the replica databases, "
+        "a stand-in for replication when running locally"
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError(
+                "Only SQLite replicas are copied, others are kept "
+                "up to date by the database server"
+            )
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("DB_REPLICAS is not set")
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"{alias}: {replica.settings_dict['NAME']}")
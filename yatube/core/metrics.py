@@ -0,0 +1,323 @@
+"""Prometheus metrics summed over the worker processes of a host.
+
+Each process counts in memory and, after a request it served and at most
+once per ``FLUSH_INTERVAL``, writes its totals to a file of its own in
+``METRICS_DIR``: processes never lock each other, and those that serve no
+requests (commands, tests) write nothing. ``render`` sums the files of
+all processes with this one's totals. A live process takes over the file
+of an exited one, adding its totals to its own, so counters never go back
+when a worker is recycled and the directory doesn't grow.
+"""
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+SECONDS_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+FAMILIES = {
+    "yatube_http_requests_total": (
+        "counter",
+        "Requests by view name, method and status",
+    ),
+    "yatube_http_request_duration_seconds": (
+        "histogram",
+        "Request latency by view name",
+    ),
+    "yatube_db_queries_per_request": (
+        "histogram",
+        "SQL queries of a request by view name",
+    ),
+    "yatube_db_duration_seconds": (
+        "histogram",
+        "SQL time of a request by view name",
+    ),
+    "yatube_cache_requests_total": (
+        "counter",
+        "Cache lookups by key prefix and result",
+    ),
+    "yatube_cache_hit_ratio": (
+        "gauge",
+        "Share of cache lookups that hit, by key prefix",
+    ),
+    "yatube_thumbnail_generation_seconds": (
+        "histogram",
+        "Time to generate a thumbnail; _count is the number generated",
+    ),
+}
+# Samples of a family in the order they are exposed.
+SUFFIXES = ("", "_bucket", "_sum", "_count")
+
+# Leading letters of a cache key: "generation:posts" -> "generation",
+# "sorl-thumbnail||image||..." -> "sorl-thumbnail".
+_PREFIX = re.compile(r"[A-Za-z_-]*")
+
+Labels = Tuple[Tuple[str, str], ...]
+# (family, suffix of the sample, labels)
+Key = Tuple[str, str, Labels]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._values: Dict[Key, float] = defaultdict(float)
+        self._pid = os.getpid()
+        # A recycled pid must not overwrite the file of an exited worker.
+        self._path_name = f"{self._pid}-{time.time_ns()}.json"
+        self._flushed = time.monotonic()
+        self._dirty = False
+
+    def _check_fork(self) -> None:
+        # A forked worker starts counting from zero in a file of its own.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, "", _labels(labels))
+        with self._lock:
+            self._check_fork()
+            self._values[key] += amount
+            self._dirty = True
+
+    def observe(
+        self, name: str, value: float, buckets: Iterable[float], **labels
+    ) -> None:
+        """Add *value* to the histogram *name*."""
+        labels = _labels(labels)
+        with self._lock:
+            self._check_fork()
+            # Every bucket is exposed, even those no value fell into yet.
+            for bound in (*buckets, math.inf):
+                le = (("le", _format(bound)),)
+                self._values[(name, "_bucket", labels + le)] += (
+                    1 if value <= bound else 0
+                )
+            self._values[(name, "_sum", labels)] += value
+            self._values[(name, "_count", labels)] += 1
+            self._dirty = True
+
+    def absorb(self, rows: Iterable[list]) -> None:
+        """Add the rows of another process's file to these totals."""
+        with self._lock:
+            self._check_fork()
+            for name, suffix, labels, value in rows:
+                labels = tuple(tuple(label) for label in labels)
+                self._values[(name, suffix, labels)] += value
+            self._dirty = True
+
+    def values(self) -> Dict[Key, float]:
+        with self._lock:
+            self._check_fork()
+            return dict(self._values)
+
+    @property
+    def path_name(self) -> str:
+        with self._lock:
+            self._check_fork()
+            return self._path_name
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write the totals, if anything was counted since the last time.
+
+        Errors are logged, never raised: metrics must not fail a request.
+        Returns whether the totals are on disk.
+        """
+        with self._lock:
+            self._check_fork()
+            if not self._dirty:
+                return True
+            self._dirty = False
+            rows = [
+                [name, suffix, labels, value]
+                for (name, suffix, labels), value in self._values.items()
+            ]
+            self._flushed = time.monotonic()
+            path = os.path.join(settings.METRICS_DIR, self._path_name)
+        try:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(rows, file)
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            logger.exception("Could not write metrics to %s", path)
+            # Tried again after FLUSH_INTERVAL.
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+
+
+def cache_prefix(key: str) -> str:
+    return _PREFIX.match(key).group() or "other"
+
+
+def record_request(view: str, method: str, status: int, summary: dict):
+    """Count a request with its ``core.timing`` summary."""
+    inc("yatube_http_requests_total", view=view, method=method, status=status)
+    observe(
+        "yatube_http_request_duration_seconds",
+        summary["total_ms"] / 1000,
+        SECONDS_BUCKETS,
+        view=view,
+    )
+    observe(
+        "yatube_db_queries_per_request",
+        summary["queries"],
+        QUERIES_BUCKETS,
+        view=view,
+    )
+    observe(
+        "yatube_db_duration_seconds",
+        summary["db_ms"] / 1000,
+        SECONDS_BUCKETS,
+        view=view,
+    )
+    registry.maybe_flush()
+
+
+def _exited(path: str) -> bool:
+    try:
+        pid = int(os.path.basename(path).split("-", 1)[0])
+    except ValueError:
+        return False
+    if os.name != "posix":
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _read(path: str) -> list:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        # Taken over by another process meanwhile.
+        return []
+
+
+def collect() -> Dict[Key, float]:
+    """Totals of all processes, this one up to date."""
+    own = registry.path_name
+    totals = defaultdict(float)
+    retired = []
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.json")):
+        if os.path.basename(path) == own:
+            continue
+        if _exited(path):
+            # Renaming lets a single process take the file over.
+            try:
+                os.replace(path, f"{path}.retired")
+            except FileNotFoundError:
+                continue
+            retired.append(f"{path}.retired")
+            registry.absorb(_read(f"{path}.retired"))
+            continue
+        for name, suffix, labels, value in _read(path):
+            labels = tuple(tuple(label) for label in labels)
+            totals[(name, suffix, labels)] += value
+    # The totals taken over are on disk before their files go.
+    if retired and registry.flush():
+        for path in retired:
+            os.remove(path)
+    for key, value in registry.values().items():
+        totals[key] += value
+    return totals
+
+
+def _format(value: float) -> str:
+    return "+Inf" if math.isinf(value) else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _sort_key(item):
+    (name, suffix, labels), _ = item
+    le = dict(labels).get("le")
+    return (
+        name,
+        SUFFIXES.index(suffix),
+        tuple(label for label in labels if label[0] != "le"),
+        math.inf if le == "+Inf" else float(le or 0),
+    )
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    totals = collect()
+
+    hits = defaultdict(float)
+    lookups = defaultdict(float)
+    for (name, _, labels), value in totals.items():
+        if name == "yatube_cache_requests_total":
+            labels = dict(labels)
+            lookups[labels["prefix"]] += value
+            if labels["result"] == "hit":
+                hits[labels["prefix"]] += value
+    for prefix, count in lookups.items():
+        totals[("yatube_cache_hit_ratio", "", (("prefix", prefix),))] = (
+            hits[prefix] / count
+        )
+
+    lines = []
+    family = None
+    for (name, suffix, labels), value in sorted(totals.items(), key=_sort_key):
+        if name != family:
+            family = name
+            kind, help_text = FAMILIES.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        label_text = ",".join(
+            f'{label}="{_escape(text)}"' for label, text in labels
+        )
+        series = f"{name}{suffix}"
+        if label_text:
+            series += f"{{{label_text}}}"
+        lines.append(f"{series} {_format(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import cProfile
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .. import profiling, timing
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Capture profiles of requests slower than ``PROFILING_SLOW_MS``.
+
+    Stacks of a ``PROFILING_SAMPLE_RATE`` share of requests are sampled;
+    slow requests are saved with the view name, parameters and the stacks
+    if there are any. A view that was slow gets its next
+    request profiled with cProfile as well, at most once per
+    ``PROFILING_COOLDOWN`` seconds. ``PROFILING_SLOW_MS = 0`` turns the
+    middleware off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SLOW_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = profiling.StackSampler(
+            settings.PROFILING_INTERVAL_MS / 1000
+        )
+        self.store = profiling.ProfileStore(
+            settings.PROFILING_DIR, settings.PROFILING_MAX_FILES
+        )
+        # View name -> when its last cProfile run was scheduled.
+        self.scheduled = {}
+        self.due = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        thread_id = threading.get_ident()
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            self.sampler.watch(thread_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            stacks = self.sampler.unwatch(thread_id)
+            profiler = getattr(request, "profiler", None)
+            if profiler is not None:
+                profiler.disable()
+
+        if elapsed * 1000 >= settings.PROFILING_SLOW_MS:
+            try:
+                self.capture(request, response, elapsed, stacks, profiler)
+            except Exception:
+                # A profile is never worth failing the request.
+                logger.exception("Could not save the profile of %s", request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = request.resolver_match.view_name
+        with self.lock:
+            if view not in self.due:
+                return None
+            self.due.discard(view)
+        request.profiler = cProfile.Profile()
+        request.profiler.enable()
+        return None
+
+    def capture(self, request, response, elapsed, stacks, profiler):
+        match = request.resolver_match
+        view = match.view_name if match is not None else "-"
+        timings = timing.current()
+        self.store.save(
+            {
+                "created": time.time(),
+                "view": view,
+                "method": request.method,
+                "path": request.path,
+                "kwargs": match.kwargs if match is not None else {},
+                "query": request.GET.dict(),
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "timing": timings.summary() if timings else None,
+            },
+            stacks,
+            profiler,
+        )
+        if profiler is None and match is not None:
+            now = time.monotonic()
+            with self.lock:
+                last = self.scheduled.get(view)
+                if last is None or now - last >= settings.PROFILING_COOLDOWN:
+                    self.scheduled[view] = now
+                    self.due.add(view)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..queries import check_budget
+
+
+class QueryBudgetMiddleware:
+    """Fail pages that run more queries than their view declares.
+
+    Only active with ``DEBUG`` on; views without ``query_budget`` are not
+    checked.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_response(request)
+        limit = getattr(request, "query_budget", None)
+        if limit is not None and request.method in ("GET", "HEAD"):
+            check_budget(limit, queries.captured_queries, request.path)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .. import db_router
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of each request, see core.db_router.
+
+    Unused without ``DATABASE_REPLICAS``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = db_router.RoutingState(
+            pinned=settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        )
+        token = db_router.activate(state)
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(state):
+                response = self.get_response(request)
+        finally:
+            db_router.deactivate(token)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
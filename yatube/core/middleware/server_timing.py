@@ -0,0 +1,68 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .. import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Measure where the time of each request goes.
+
+    SQL, cache and template time is sent in the ``Server-Timing`` header
+    (unless ``SERVER_TIMING_HEADER`` is off), logged at INFO level with
+    the resolved view name and counted in ``core.metrics``. Only durations
+    and counters are exposed, never queries or keys.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.Timings()
+        token = timing.activate(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+
+        summary = timings.summary()
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = self.header(summary)
+        match = request.resolver_match
+        view = match.view_name if match is not None else "-"
+        logger.info(
+            "view=%s method=%s status=%s %s",
+            view,
+            request.method,
+            response.status_code,
+            " ".join(f"{name}={value}" for name, value in summary.items()),
+            extra={"view": view, "timing": summary},
+        )
+        metrics.record_request(
+            view, request.method, response.status_code, summary
+        )
+        return response
+
+    @staticmethod
+    def header(summary: dict) -> str:
+        return ", ".join(
+            (
+                f'db;dur={summary["db_ms"]};desc="{summary["queries"]} '
+                'queries"',
+                f'cache;dur={summary["cache_ms"]};desc="'
+                f'{summary["cache_hits"]} hits, '
+                f'{summary["cache_misses"]} misses"',
+                f'template;dur={summary["template_ms"]}',
+                f'app;dur={summary["app_ms"]}',
+                f'total;dur={summary["total_ms"]}',
+            )
+        )
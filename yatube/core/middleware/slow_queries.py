@@ -0,0 +1,26 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from ..slow_queries import SlowQueryRecorder
+
+
+class SlowQueryMiddleware:
+    """Log slow and repeated queries of each request, see core.slow_queries.
+
+    ``SLOW_QUERY_MS = 0`` turns the log off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
@@ -0,0 +1,232 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision, which keyset equality relies on."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator driven by opaque ``next``/``previous`` tokens.
+
+    Pages are selected with a ``WHERE (created, id) < (...)`` condition
+    instead of ``OFFSET``, and no ``COUNT(*)`` is ever issued, so any page
+    costs the same as the first one. *ordering* must identify a row
+    uniquely, e.g. ``("-created", "-pk")``.
+    """
+
+    keyset = True
+
+    def __init__(
+        self,
+        object_list,
+        per_page: int,
+        ordering: Sequence[str] = ("-created", "-pk"),
+    ):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    @property
+    def _keys(self):
+        return [
+            (field.lstrip("-"), field.startswith("-"))
+            for field in self.ordering
+        ]
+
+    def encode_cursor(self, obj, reverse: bool = False) -> str:
+        values = [getattr(obj, name) for name, _ in self._keys]
+        payload = json.dumps([reverse, values], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor: Optional[str]):
+        """Return ``(reverse, values)`` or ``None`` for a bad token."""
+        if not cursor:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode())
+            reverse, values = json.loads(payload)
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            return None
+        if not isinstance(reverse, bool) or not isinstance(values, list):
+            return None
+        if len(values) != len(self._keys):
+            return None
+        try:
+            values = [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self._keys, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if None in values:
+            return None
+        return reverse, values
+
+    def _field(self, name: str):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        meta = self.object_list.model._meta
+        return meta.pk if name == "pk" else meta.get_field(name)
+
+    def _seek(self, values, reverse: bool) -> Q:
+        """Rows strictly after *values* in (possibly reversed) order."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._keys, values):
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_page(self, cursor: Optional[str]) -> Page:
+        """Page of rows after *cursor*, numbered by it.
+
+        The cursors of neighbour pages stand for page numbers:
+        ``next_page_number()`` can be passed back to ``get_page()``, and
+        ``number`` is ``None`` on the first page.
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            cursor, decoded = None, (False, None)
+        reverse, values = decoded
+        window = KeysetWindow(self, values, reverse)
+        page = Page(window, cursor, self)
+        # Templates expect a plain Page; its navigation is the window's.
+        for name in KeysetWindow.PAGE_METHODS:
+            setattr(page, name, getattr(window, name))
+        return page
+
+
+class KeysetWindow(list):
+    """Rows of a cursor page, fetched on first access.
+
+    Nothing hits the database until the page is iterated, so a template
+    fragment served from cache skips the feed query altogether. The
+    cursors of neighbour pages are exposed as ``next_cursor`` and
+    ``previous_cursor``, and the navigation methods of ``Page`` are
+    provided for ``CursorPaginator.get_page()``. Keyset pages never count
+    rows, so they don't know their offset: ``start_index()`` and
+    ``end_index()`` are not supported.
+    """
+
+    PAGE_METHODS = (
+        "has_next",
+        "has_previous",
+        "next_page_number",
+        "previous_page_number",
+        "start_index",
+        "end_index",
+    )
+
+    def __init__(self, paginator: CursorPaginator, values, reverse: bool):
+        super().__init__()
+        self.paginator = paginator
+        self.values = values
+        self.reverse = reverse
+        self._fetched = False
+        self._next_cursor = None
+        self._previous_cursor = None
+
+    def _fetch(self) -> None:
+        if self._fetched:
+            return
+        self._fetched = True
+
+        paginator = self.paginator
+        queryset = paginator.object_list
+        if self.reverse:
+            queryset = queryset.reverse()
+        if self.values is not None:
+            queryset = queryset.filter(
+                paginator._seek(self.values, self.reverse)
+            )
+
+        items = list(queryset[: paginator.per_page + 1])
+        has_more = len(items) > paginator.per_page
+        items = items[: paginator.per_page]
+        if self.reverse:
+            items.reverse()
+        super().extend(items)
+        if not items:
+            return
+
+        seeked = self.values is not None
+        has_next, has_previous = (
+            (seeked, has_more) if self.reverse else (has_more, seeked)
+        )
+        if has_next:
+            self._next_cursor = paginator.encode_cursor(items[-1])
+        if has_previous:
+            self._previous_cursor = paginator.encode_cursor(
+                items[0], reverse=True
+            )
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        self._fetch()
+        return self._next_cursor
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        self._fetch()
+        return self._previous_cursor
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def next_page_number(self) -> str:
+        if not self.has_next():
+            raise EmptyPage("That page contains no results")
+        return self.next_cursor
+
+    def previous_page_number(self) -> str:
+        if not self.has_previous():
+            raise EmptyPage("That page contains no results")
+        return self.previous_cursor
+
+    def start_index(self):
+        raise NotImplementedError("Keyset pages don't know their offset")
+
+    def end_index(self):
+        raise NotImplementedError("Keyset pages don't know their offset")
+
+    def __iter__(self):
+        self._fetch()
+        return super().__iter__()
+
+    def __reversed__(self):
+        self._fetch()
+        return super().__reversed__()
+
+    def __len__(self):
+        self._fetch()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._fetch()
+        return super().__getitem__(index)
+
+    def __contains__(self, item):
+        self._fetch()
+        return super().__contains__(item)
+
+    def __repr__(self):
+        self._fetch()
+        return super().__repr__()
@@ -0,0 +1,152 @@
+"""Profiles of slow requests, captured in production.
+
+``StackSampler`` is a statistical profiler: one background thread per
+process looks at the stacks of the threads serving requests every
+``PROFILING_INTERVAL_MS`` (tens of milliseconds), so a request pays two
+dictionary operations however long it runs.
+``core.middleware.profiling.ProfilingMiddleware`` keeps the samples of
+requests over ``PROFILING_SLOW_MS`` and runs the next request of such a
+view under cProfile. Captures go to ``ProfileStore``, a directory holding
+at most ``PROFILING_MAX_FILES`` of the latest ones.
+"""
+import cProfile
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Deeper frames (Django's machinery) add nothing to a folded stack.
+MAX_DEPTH = 64
+# Distinct stacks kept per capture.
+MAX_STACKS = 500
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def fold(frame) -> str:
+    """Stack of *frame* from the outermost call, joined with ``;``."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._watched: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def _ensure_thread(self) -> None:
+        # Threads don't survive the fork of a worker process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(
+                target=self._run, name="yatube-sampler", daemon=True
+            ).start()
+            self._pid = os.getpid()
+
+    def watch(self, thread_id: int) -> None:
+        self._ensure_thread()
+        with self._lock:
+            self._watched[thread_id] = Counter()
+        self._wakeup.set()
+
+    def unwatch(self, thread_id: int) -> Counter:
+        """Stop sampling *thread_id* and return its folded stacks."""
+        with self._lock:
+            return self._watched.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                watched = list(self._watched.items())
+                if not watched:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            samples = [
+                (thread_id, stacks, fold(frames[thread_id]))
+                for thread_id, stacks in watched
+                if thread_id in frames
+            ]
+            # Counters handed out by unwatch() are never touched again.
+            with self._lock:
+                for thread_id, stacks, stack in samples:
+                    if self._watched.get(thread_id) is stacks:
+                        stacks[stack] += 1
+
+
+class ProfileStore:
+    """Ring buffer of captures: ``<name>.json`` and maybe ``<name>.prof``."""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(
+        self,
+        meta: dict,
+        stacks: Counter,
+        profiler: Optional[cProfile.Profile] = None,
+    ) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        # Names sort by time of capture.
+        name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+        path = os.path.join(self.directory, name)
+        if profiler is not None:
+            profiler.dump_stats(f"{path}.prof")
+        data = {
+            **meta,
+            "name": name,
+            "cprofile": profiler is not None,
+            "samples": sum(stacks.values()),
+            "stacks": dict(stacks.most_common(MAX_STACKS)),
+        }
+        # Readers never see a half-written capture.
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(data, file)
+        os.replace(f"{path}.tmp", f"{path}.json")
+        self.prune()
+        return name
+
+    def prune(self) -> None:
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.json")))
+        excess = max(len(paths) - self.max_files, 0)
+        for path in paths[:excess]:
+            stem = os.path.splitext(path)[0]
+            for old in (path, f"{stem}.prof"):
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    # Pruned by another worker meanwhile.
+                    pass
+
+    def load(self) -> List[dict]:
+        """Every capture in the buffer, oldest first."""
+        captures = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            try:
+                with open(path) as file:
+                    capture = json.load(file)
+            except FileNotFoundError:
+                continue
+            stem = os.path.splitext(path)[0]
+            capture["prof"] = f"{stem}.prof" if capture["cprofile"] else None
+            captures.append(capture)
+        return captures
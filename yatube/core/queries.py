@@ -0,0 +1,94 @@
+"""SQL query budgets and plans of views.
+
+A view declares how many queries one GET request may run::
+
+    @query_budget(5)
+    def index(request):
+        ...
+
+Tests check it with ``assert_query_budget`` and, with ``DEBUG`` on,
+``core.middleware.query_budget.QueryBudgetMiddleware`` fails every page
+that goes over its budget. ``explain`` and ``unindexed_steps`` let tests
+check that the queries of a page are served by indexes.
+"""
+import re
+from contextlib import contextmanager
+from typing import List
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit: int):
+    """Declare the maximum number of queries of a GET of the view."""
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def is_bookkeeping(sql: str) -> bool:
+    """Whether *sql* is a savepoint of ``ATOMIC_REQUESTS``, not a query."""
+    return "SAVEPOINT" in sql
+
+
+def counted(queries: List[dict]) -> List[str]:
+    """SQL of *queries* without the savepoints of ``ATOMIC_REQUESTS``."""
+    return [
+        query["sql"] for query in queries if not is_bookkeeping(query["sql"])
+    ]
+
+
+def check_budget(limit: int, queries: List[dict], label: str = "") -> None:
+    executed = counted(queries)
+    if len(executed) > limit:
+        raise QueryBudgetExceeded(
+            f"{label or 'Block'} ran {len(executed)} queries, "
+            f"the budget is {limit}:\n"
+            + "\n".join(f"{num}. {sql}" for num, sql in enumerate(executed, 1))
+        )
+
+
+@contextmanager
+def assert_query_budget(limit: int, using: str = DEFAULT_DB_ALIAS):
+    """Fail if the enclosed block runs more than *limit* queries."""
+    with CaptureQueriesContext(connections[using]) as queries:
+        yield queries
+    check_budget(limit, queries.captured_queries)
+
+
+def explain(sql: str, using: str = DEFAULT_DB_ALIAS) -> str:
+    """Plan of *sql* as the database reports it, one step per line.
+
+    On PostgreSQL sequential scans and sorts are priced out first, so tiny
+    test tables are planned as if they were large: what remains are the
+    steps no index could replace.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(row[-1] for row in cursor.fetchall())
+    raise NotImplementedError(f"EXPLAIN of {connection.vendor} is unknown")
+
+
+def unindexed_steps(plan: str) -> List[str]:
+    """Steps of an ``explain`` plan that scan a table or sort rows."""
+    return [
+        step.strip()
+        for step in plan.splitlines()
+        if re.search(r"Seq Scan|Sort\b", step)
+        or re.match(r"SCAN (TABLE )?\w+$", step.strip())
+        or "TEMP B-TREE" in step
+    ]
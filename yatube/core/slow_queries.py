@@ -0,0 +1,203 @@
+"""Log of slow and repeated SQL queries, with the code that ran them.
+
+``SlowQueryRecorder`` is an ``execute_wrapper`` installed for each request
+by ``core.middleware.slow_queries.SlowQueryMiddleware``. A query slower
+than ``SLOW_QUERY_MS``, or the ``SLOW_QUERY_REPEATS``-th run of the same
+SQL in one request (an N+1), is logged as one JSON line with:
+
+* the resolved view of the request;
+* the innermost frame of the project's own code;
+* the template node (file and line) and the serializer field being
+  rendered, if any;
+* how many times the request ran this SQL, and with the same parameters;
+* with ``SLOW_QUERY_EXPLAIN``, the plan of slow SELECT queries.
+
+Parameters (session keys, password hashes, emails...) are only logged
+with ``SLOW_QUERY_LOG_PARAMS``; otherwise a query is known by its SQL.
+
+Walking the stack costs something, so it only happens for logged queries.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import sys
+from collections import Counter
+from time import perf_counter
+from typing import Optional
+
+from django.conf import settings
+
+from .queries import is_bookkeeping
+
+logger = logging.getLogger(__name__)
+
+
+class LogHandler(logging.handlers.RotatingFileHandler):
+    """Rotating log at ``SLOW_QUERY_LOG``, following changes of the setting.
+
+    ``LOGGING`` builds the handler once; tests and the benchmark point the
+    setting at scratch files later, so the path is checked on every record.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(settings.SLOW_QUERY_LOG, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+    def emit(self, record):
+        path = os.path.abspath(settings.SLOW_QUERY_LOG)
+        if path != self.baseFilename:
+            self.acquire()
+            try:
+                self.close()
+                self.baseFilename = path
+            finally:
+                self.release()
+        super().emit(record)
+
+
+# Code of the instrumentation itself is never the origin of a query.
+INSTRUMENTATION = (
+    os.path.join("core", "slow_queries.py"),
+    os.path.join("core", "timing.py"),
+    os.path.join("core", "backends", ""),
+    os.path.join("core", "middleware", ""),
+)
+MAX_SQL_LENGTH = 2000
+MAX_PARAMS_LENGTH = 500
+
+
+def _is_project_file(filename: str) -> bool:
+    if "site-packages" in filename:
+        return False
+    path = os.path.relpath(filename, settings.BASE_DIR)
+    return not path.startswith((os.pardir, *INSTRUMENTATION))
+
+
+def attribute(frame) -> dict:
+    """Innermost project frame, template node and serializer field."""
+    result = {"frame": None, "template": None, "serializer": None}
+    while frame is not None:
+        code = frame.f_code
+        if result["frame"] is None and _is_project_file(code.co_filename):
+            result["frame"] = (
+                f"{os.path.relpath(code.co_filename, settings.BASE_DIR)}:"
+                f"{frame.f_lineno} in {code.co_name}"
+            )
+        elif result["template"] is None and code.co_name == "render_annotated":
+            # django.template.base.Node.render_annotated()
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                result["template"] = f"{origin.template_name}:{token.lineno}"
+        elif (
+            result["serializer"] is None
+            and code.co_name == "to_representation"
+            and "field" in frame.f_locals
+        ):
+            # rest_framework.serializers.Serializer.to_representation()
+            serializer = type(frame.f_locals.get("self")).__name__
+            field = frame.f_locals["field"].field_name
+            result["serializer"] = f"{serializer}.{field}"
+        frame = frame.f_back
+    return result
+
+
+def _explain(connection, sql: str, params) -> Optional[str]:
+    prefix = {
+        "postgresql": "EXPLAIN",
+        "sqlite": "EXPLAIN QUERY PLAN",
+    }.get(connection.vendor)
+    if prefix is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+class SlowQueryRecorder:
+    def __init__(self, request=None):
+        self.request = request
+        self.executions = Counter()
+        self.duplicates = Counter()
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+        started = perf_counter()
+        failed = False
+        try:
+            return execute(sql, params, many, context)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not is_bookkeeping(sql):
+                self.check(
+                    sql,
+                    params,
+                    many,
+                    context["connection"],
+                    (perf_counter() - started) * 1000,
+                    failed,
+                )
+
+    def check(self, sql, params, many, connection, duration_ms, failed):
+        self.executions[sql] += 1
+        duplicates = 0
+        if not many:
+            signature = (sql, repr(params))
+            self.duplicates[signature] += 1
+            duplicates = self.duplicates[signature]
+
+        if duration_ms >= settings.SLOW_QUERY_MS:
+            kind = "slow"
+        elif self.executions[sql] == settings.SLOW_QUERY_REPEATS:
+            kind = "repeated"
+        else:
+            return
+
+        record = {
+            "kind": kind,
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "database": connection.alias,
+            "sql": sql[:MAX_SQL_LENGTH],
+            "executions": self.executions[sql],
+            "duplicates": duplicates,
+            **self.describe_request(),
+            **attribute(sys._getframe(1)),
+        }
+        if settings.SLOW_QUERY_LOG_PARAMS:
+            record["params"] = repr(params)[:MAX_PARAMS_LENGTH]
+        if (
+            kind == "slow"
+            and settings.SLOW_QUERY_EXPLAIN
+            and not failed
+            and not many
+            and sql.lstrip().upper().startswith("SELECT")
+        ):
+            self._explaining = True
+            try:
+                record["plan"] = _explain(connection, sql, params)
+            except Exception as error:
+                record["plan"] = f"EXPLAIN failed: {error}"
+            finally:
+                self._explaining = False
+        logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+    def describe_request(self) -> dict:
+        if self.request is None:
+            return {"view": None}
+        match = self.request.resolver_match
+        return {
+            "view": match.view_name if match is not None else None,
+            "method": self.request.method,
+            "path": self.request.path,
+        }
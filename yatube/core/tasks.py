@@ -0,0 +1,44 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_TASKS_WORKERS,
+            thread_name_prefix="yatube-task",
+        )
+    return _executor
+
+
+def _run(func: Callable, args: tuple, kwargs: dict) -> None:
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__qualname__)
+    finally:
+        close_old_connections()
+
+
+def defer(func: Callable, *args, **kwargs) -> None:
+    """Run *func* in a worker thread once the current transaction commits.
+
+    With ``BACKGROUND_TASKS_ASYNC`` switched off the call happens inline,
+    inside the caller's transaction.
+    """
+    if not settings.BACKGROUND_TASKS_ASYNC:
+        func(*args, **kwargs)
+        return
+
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
@@ -0,0 +1,49 @@
+from core import caching
+from django import template
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, key, namespaces=None):
+        self.nodelist = nodelist
+        self.key = key
+        self.namespaces = namespaces
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+
+        namespaces = self.namespaces and self.namespaces.resolve(context)
+        return caching.single_flight(
+            key, lambda: self.nodelist.render(context), namespaces or ()
+        )
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """Cache the enclosed fragment under a key built by ``core.caching``.
+
+    Usage::
+
+        {% load fragment_cache %}
+        {% fragment_cache cache_key [cache_namespaces] %}
+            .. some expensive processing ..
+        {% endfragment_cache %}
+
+    An empty key renders the fragment without caching. While one request
+    re-renders an invalidated fragment, the others get its previous copy.
+    The optional namespaces, those the key was made for, route the reads
+    of the fragment right after their writes to the primary database.
+    """
+    bits = token.split_contents()
+    if len(bits) not in (2, 3):
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires one or two arguments."
+        )
+    nodelist = parser.parse(("endfragment_cache",))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist, *(parser.compile_filter(bit) for bit in bits[1:])
+    )
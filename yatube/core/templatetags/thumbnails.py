@@ -0,0 +1,35 @@
+from core import thumbnails
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("includes/picture.html")
+def picture(file_, preset, sizes="100vw", css_class=""):
+    """``<picture>`` of a ``THUMBNAIL_PRESETS`` preset, all its variants.
+
+    Usage::
+
+        {% load thumbnails %}
+        {% picture post.image "post" sizes="100vw" css_class="card-img" %}
+
+    Thumbnails are never created in place: until they exist a placeholder
+    of the same size is shown. Renders nothing without an image.
+    """
+    return {
+        "picture": thumbnails.get(file_, preset),
+        "sizes": sizes,
+        "css_class": css_class,
+    }
+
+
+@register.simple_tag
+def prefetch_thumbnails(objects, field, preset):
+    """Look the thumbnails of a page up in one go, before its loop.
+
+    Usage::
+
+        {% prefetch_thumbnails page_obj "image" "post" %}
+    """
+    thumbnails.prefetch([getattr(obj, field) for obj in objects], preset)
+    return ""
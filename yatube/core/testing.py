@@ -0,0 +1,19 @@
+"""Settings of the test suites, for ``manage.py test`` and pytest alike."""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    # Deferred tasks run inline, so tests see their effects at once.
+    "BACKGROUND_TASKS_ASYNC": False,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
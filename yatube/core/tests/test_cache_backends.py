@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..backends.sqlite_cache import SQLiteCache
+from ..backends.tiered_cache import TieredCache
+
+
+def _increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr("counter")
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, "cache.sqlite3")
+        self.cache = SQLiteCache(
+            self.location, {"OPTIONS": {"MAX_ENTRIES": 10}}
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются"""
+        self.cache.set("key", {"answer": 42})
+        self.cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.cache.get("key"), {"answer": 42})
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": 2}
+        )
+
+        self.cache.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(["a", "b"]), {})
+
+    def test_expiration(self):
+        """Просроченные значения не возвращаются"""
+        self.cache.set("key", "value", timeout=1)
+        self.cache.set("forever", "value", timeout=None)
+        self.assertTrue(self.cache.has_key("key"))
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get("key"))
+        self.assertFalse(self.cache.has_key("key"))
+        self.assertEqual(self.cache.get("forever"), "value")
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живое значение, incr атомарно прибавляет"""
+        self.assertTrue(self.cache.add("key", 1))
+        self.assertFalse(self.cache.add("key", 2))
+        self.assertEqual(self.cache.incr("key", 10), 11)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+        self.cache.set("expired", 1, timeout=-1)
+        self.assertTrue(self.cache.add("expired", 2))
+        self.assertEqual(self.cache.get("expired"), 2)
+
+    def test_lru_cull(self):
+        """При превышении MAX_ENTRIES удаляются давно читанные значения"""
+        for num in range(11):
+            self.cache.set(f"key{num}", num)
+        connection = self.cache._connection()
+        connection.execute("UPDATE cache SET accessed = accessed - 10")
+        self.cache.get("key0")
+        self.cache._cull()
+
+        self.assertEqual(self.cache.get("key0"), 0)
+        self.assertLessEqual(
+            len(self.cache.get_many([f"key{num}" for num in range(11)])), 10
+        )
+
+    def test_shared_between_processes(self):
+        """Все процессы работают с одним хранилищем"""
+        self.cache.set("counter", 0, timeout=None)
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.cache.get("counter"), 200)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tiered-test",
+        },
+    }
+)
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.shared = caches["shared"]
+        self.cache = TieredCache("shared", {"OPTIONS": {"L1_TIMEOUT": 1}})
+        self.cache.clear()
+
+    def test_reads_are_served_locally(self):
+        """Повторное чтение не доходит до общего кеша"""
+        self.shared.set("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(
+            self.cache.stats(),
+            {"l1_hits": 1, "l1_misses": 2, "l2_hits": 1, "l2_misses": 1},
+        )
+
+    def test_local_copy_expires(self):
+        """Чужие изменения видны после истечения L1_TIMEOUT"""
+        self.cache.set("key", "old")
+        self.shared.set("key", "new")
+        self.assertEqual(self.cache.get("key"), "old")
+        time.sleep(1.1)
+        self.assertEqual(self.cache.get("key"), "new")
+
+    def test_writes_update_both_tiers(self):
+        """Запись и incr сразу видны в обоих уровнях"""
+        self.cache.set_many({"a": 1, "b": 2})
+        self.assertEqual(self.shared.get_many(["a", "b"]), {"a": 1, "b": 2})
+        self.assertEqual(self.cache.incr("a", 10), 11)
+        self.assertEqual(self.cache.get("a"), 11)
+        self.assertEqual(self.shared.get("a"), 11)
+
+        self.cache.delete("b")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertFalse(self.shared.has_key("b"))
+
+
+class TestSettingsTest(SimpleTestCase):
+    def test_private_cache(self):
+        """Тесты не пишут в файл кеша сайта"""
+        self.assertNotIsInstance(caches["shared"], SQLiteCache)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .. import caching
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computes_once(self):
+        """Значение вычисляется один раз и берётся из кеша"""
+        compute = mock.Mock(return_value="value")
+        key = caching.make_key("test", ["test"])
+        self.assertEqual(caching.single_flight(key, compute), "value")
+        self.assertEqual(caching.single_flight(key, compute), "value")
+        compute.assert_called_once()
+
+    def test_release_changes_keys(self):
+        """Новый релиз меняет ключи и время изменения данных"""
+        with override_settings(CACHE_VERSION="1"):
+            old_key = caching.make_key("test", ["test"])
+            modified = caching.last_modified(["test"])
+        with override_settings(CACHE_VERSION="2"), mock.patch.object(
+            caching.time, "time", return_value=modified + 60
+        ):
+            self.assertNotEqual(caching.make_key("test", ["test"]), old_key)
+            self.assertEqual(caching.last_modified(["test"]), modified + 60)
+
+    def test_serves_stale_while_locked(self):
+        """Пока другой процесс пересчитывает значение, отдаётся старое"""
+        old_key = caching.make_key("test", ["test"], 1)
+        caching.single_flight(old_key, lambda: "old")
+        caching.bump("test")
+        new_key = caching.make_key("test", ["test"], 1)
+        self.assertNotEqual(old_key, new_key)
+
+        cache.add(f"lock:{new_key}", True)
+        compute = mock.Mock(return_value="new")
+        self.assertEqual(caching.single_flight(new_key, compute), "old")
+        compute.assert_not_called()
+
+        cache.delete(f"lock:{new_key}")
+        self.assertEqual(caching.single_flight(new_key, compute), "new")
+
+    def test_cold_cache_while_locked(self):
+        """Без старой копии значение вычисляется без ожидания"""
+        key = caching.make_key("test", ["test"], 2)
+        cache.add(f"lock:{key}", True)
+        self.assertEqual(caching.single_flight(key, lambda: "value"), "value")
+
+    def test_lock_released_on_error(self):
+        """Ошибка вычисления не оставляет блокировку"""
+        key = caching.make_key("test", ["test"], 3)
+        with self.assertRaises(RuntimeError):
+            caching.single_flight(key, mock.Mock(side_effect=RuntimeError))
+        self.assertFalse(cache.has_key(f"lock:{key}"))
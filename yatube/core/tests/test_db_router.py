@@ -0,0 +1,124 @@
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from posts.models import Group, Post, User
+
+from .. import caching, db_router
+from ..middleware.replicas import ReplicaRoutingMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.group = Group.objects.create(title="Группа", slug="test-slug")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        cls.group.delete()
+        super().tearDownClass()
+
+    def route(self, view, **cookies):
+        """Пропускает запрос через middleware, сохраняя базу чтения"""
+        used = []
+
+        def get_response(request):
+            view()
+            used.append(Post.objects.all().db)
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies)
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return used[0], response
+
+    def activate(self, state):
+        token = db_router.activate(state)
+        self.addCleanup(db_router.deactivate, token)
+
+    def test_reads(self):
+        """Чтение запроса идёт на реплику, вне запроса — на основную базу"""
+        self.assertEqual(Post.objects.all().db, "default")
+        self.activate(db_router.RoutingState())
+        self.assertEqual(Post.objects.all().db, "replica1")
+        self.assertEqual(Post.objects.db_manager().db, "replica1")
+
+    def test_write_pins_reads(self):
+        """После записи чтение запроса идёт на основную базу"""
+        self.activate(db_router.RoutingState())
+        self.assertEqual(
+            Post.objects.create(text="Пост", author=self.user)._state.db,
+            "default",
+        )
+        self.assertEqual(Post.objects.all().db, "default")
+
+    def fill(self, name):
+        """Базы, с которых заполняются кеши после записи в пространство"""
+        caching.bump(name)
+        self.activate(db_router.RoutingState())
+        return [
+            caching.single_flight(
+                f"{name}:fragment", lambda: Post.objects.all().db, [name]
+            ),
+            caching.get_or_set(name, [name], lambda: Post.objects.all().db),
+        ]
+
+    def test_cache_fills_after_write_read_primary(self):
+        """Сразу после записи значения для кеша читаются с основной базы"""
+        self.assertEqual(
+            self.fill("replica-test-recent"), ["default", "default"]
+        )
+        self.assertEqual(Post.objects.all().db, "replica1")
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_later_cache_fills_read_replicas(self):
+        """Когда реплики догнали запись, кеш заполняется с реплик"""
+        self.assertEqual(
+            self.fill("replica-test-later"), ["replica1", "replica1"]
+        )
+
+    def test_instance_hint(self):
+        """Связанные объекты читаются из базы самого объекта"""
+        self.activate(db_router.RoutingState())
+        post = Post(text="Пост", author=self.user)
+        post._state.db = "default"
+        self.assertEqual(
+            db_router.ReplicaRouter().db_for_read(Post, instance=post),
+            "default",
+        )
+
+    def test_sticky_cookie(self):
+        """Записавший клиент читает с основной базы по cookie"""
+        db, response = self.route(
+            lambda: Post.objects.create(text="Пост", author=self.user)
+        )
+        self.assertEqual(db, "default")
+        cookie = response.cookies["primary"]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
+
+        db, response = self.route(lambda: None, primary="1")
+        self.assertEqual(db, "default")
+        self.assertNotIn("primary", response.cookies)
+
+    def test_read_only_request(self):
+        """Запрос без изменений читает с реплики и не ставит cookie"""
+        db, response = self.route(
+            lambda: Group.objects.get_or_create(slug="test-slug")
+        )
+        self.assertEqual(db, "default")
+        self.assertNotIn("primary", response.cookies)
+
+        db, response = self.route(lambda: None)
+        self.assertEqual(db, "replica1")
+        self.assertNotIn("primary", response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик middleware отключается"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(HttpResponse)
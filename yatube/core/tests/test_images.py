@@ -0,0 +1,111 @@
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from posts.forms import PostForm
+from posts.serializers import PostSerializer
+
+from .. import images
+
+ORIENTATION = 0x0112
+
+
+def upload(name, size, mode="RGB", image_format="JPEG", **params):
+    buffer = BytesIO()
+    Image.new(mode, size, "red").save(buffer, image_format, **params)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(
+    IMAGE_UPLOAD_MAX_SIDE=100,
+    IMAGE_UPLOAD_FORMAT="JPEG",
+    IMAGE_UPLOAD_QUALITY=80,
+)
+class NormalizeTest(SimpleTestCase):
+    def test_jpeg(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет метаданные"""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        normalized = images.normalize(
+            upload("photo.jpeg", (300, 200), exif=exif.tobytes())
+        )
+        image = Image.open(normalized)
+        self.assertEqual(normalized.name, "photo.jpg")
+        self.assertEqual(image.size, (67, 100))
+        self.assertNotIn("exif", image.info)
+        self.assertTrue(image.info.get("progressive"))
+
+    def test_colour_profile(self):
+        """Профиль RGB-фото сохраняется"""
+        normalized = images.normalize(
+            upload("photo.jpeg", (300, 200), icc_profile=b"rgb profile")
+        )
+        self.assertEqual(
+            Image.open(normalized).info["icc_profile"], b"rgb profile"
+        )
+
+    def test_cmyk(self):
+        """CMYK-фото переводится в RGB без CMYK-профиля"""
+        normalized = images.normalize(
+            upload(
+                "print.jpeg", (300, 200), "CMYK", icc_profile=b"cmyk profile"
+            )
+        )
+        image = Image.open(normalized)
+        self.assertEqual(image.mode, "RGB")
+        self.assertNotIn("icc_profile", image.info)
+
+    def test_transparency(self):
+        """Картинка с прозрачностью сохраняется в PNG"""
+        normalized = images.normalize(
+            upload("logo.png", (50, 50), "RGBA", "PNG")
+        )
+        image = Image.open(normalized)
+        self.assertEqual(normalized.name, "logo.png")
+        self.assertEqual((image.format, image.mode), ("PNG", "RGBA"))
+
+    def test_gif(self):
+        """GIF сохраняется как есть"""
+        gif = upload("anim.gif", (300, 300), "P", "GIF")
+        self.assertIs(images.normalize(gif), gif)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10_000)
+    def test_too_many_pixels(self):
+        """Слишком большая картинка отклоняется формой и API"""
+        with self.assertRaises(ValidationError):
+            images.normalize(upload("huge.png", (101, 100), "L", "PNG"))
+
+        form = PostForm(
+            data={"text": "Текст"},
+            files={"image": upload("huge.png", (101, 100), "L", "PNG")},
+        )
+        self.assertIn("image", form.errors)
+
+        serializer = PostSerializer(
+            data={
+                "text": "Текст",
+                "image": upload("huge.png", (101, 100), "L", "PNG"),
+            }
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("image", serializer.errors)
+
+    @override_settings(IMAGE_NORMALIZE_MAX_PIXELS=10_000)
+    def test_decode_limit(self):
+        """Декодируется не больше IMAGE_NORMALIZE_MAX_PIXELS пикселей"""
+        normalized = images.normalize(upload("photo.jpg", (400, 400)))
+        self.assertEqual(Image.open(normalized).size, (100, 100))
+        with self.assertRaisesMessage(ValidationError, "10000 пикселей"):
+            images.normalize(upload("huge.png", (101, 100), "L", "PNG"))
+
+    def test_form(self):
+        """Форма поста сохраняет уже обработанную картинку"""
+        form = PostForm(
+            data={"text": "Текст"},
+            files={"image": upload("photo.jpg", (400, 100))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        image = Image.open(form.cleaned_data["image"])
+        self.assertEqual(image.size, (100, 25))
@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+from sorl.thumbnail import get_thumbnail
+
+from .. import metrics
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+INDEX_REQUESTS = (
+    "yatube_http_requests_total",
+    "",
+    (("method", "GET"), ("status", "200"), ("view", "posts:index")),
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, METRICS_DIR=TEMP_METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_processes_are_summed(self):
+        """Счётчики всех процессов складываются"""
+        before = metrics.collect()[INDEX_REQUESTS]
+        self.guest_client.get(reverse("posts:index"))
+        name, suffix, labels = INDEX_REQUESTS
+        with open(os.path.join(TEMP_METRICS_DIR, "1-1.json"), "w") as file:
+            json.dump([[name, suffix, labels, 5]], file)
+        self.addCleanup(os.remove, file.name)
+
+        self.assertEqual(metrics.collect()[INDEX_REQUESTS], before + 6)
+
+    def test_exited_processes(self):
+        """Файл завершившегося процесса забирает себе живой процесс"""
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+        path = os.path.join(TEMP_METRICS_DIR, f"{process.pid}-1.json")
+        before = metrics.collect()[INDEX_REQUESTS]
+        name, suffix, labels = INDEX_REQUESTS
+        with open(path, "w") as file:
+            json.dump([[name, suffix, labels, 5]], file)
+
+        self.assertEqual(metrics.collect()[INDEX_REQUESTS], before + 5)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(metrics.collect()[INDEX_REQUESTS], before + 5)
+        own = os.path.join(TEMP_METRICS_DIR, metrics.registry.path_name)
+        with open(own) as file:
+            totals = {
+                (name, suffix, tuple(map(tuple, labels))): value
+                for name, suffix, labels, value in json.load(file)
+            }
+        self.assertEqual(totals[INDEX_REQUESTS], before + 5)
+
+    def test_idle_process(self):
+        """Процесс, ничего не посчитавший, не пишет файл"""
+        registry = metrics.Registry()
+        registry.flush()
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_METRICS_DIR, registry.path_name))
+        )
+        registry.inc("test_total")
+        registry.flush()
+        self.assertTrue(
+            os.path.exists(os.path.join(TEMP_METRICS_DIR, registry.path_name))
+        )
+        self.addCleanup(
+            os.remove, os.path.join(TEMP_METRICS_DIR, registry.path_name)
+        )
+
+    def test_write_errors(self):
+        """Ошибка записи метрик не ломает запрос"""
+        path = os.path.join(TEMP_METRICS_DIR, "file")
+        open(path, "w").close()
+        self.addCleanup(os.remove, path)
+        with override_settings(METRICS_DIR=path):
+            with self.assertLogs("core.metrics", "ERROR"):
+                metrics.registry.inc("test_total")
+                self.assertFalse(metrics.registry.flush())
+            with mock.patch.object(metrics, "FLUSH_INTERVAL", 0):
+                with self.assertLogs("core.metrics", "ERROR"):
+                    response = self.guest_client.get(reverse("posts:index"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_histogram(self):
+        """Гистограмма накапливает значения по корзинам"""
+        registry = metrics.Registry()
+        registry.observe("test_seconds", 0.3, (0.1, 0.5, 1), view="test")
+        registry.flush()
+        totals = metrics.collect()
+
+        for le, count in (("0.1", 0), ("0.5", 1), ("1.0", 1), ("+Inf", 1)):
+            with self.subTest(le=le):
+                key = (
+                    "test_seconds",
+                    "_bucket",
+                    (("view", "test"), ("le", le)),
+                )
+                self.assertEqual(totals[key], count)
+        self.assertEqual(
+            totals[("test_seconds", "_sum", (("view", "test"),))], 0.3
+        )
+
+    def test_endpoint(self):
+        """/metrics отдаёт метрики в формате Prometheus"""
+        self.guest_client.get(reverse("posts:index"))
+        with override_settings(METRICS_TOKEN="secret"):
+            response = self.guest_client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        for line in (
+            "# TYPE yatube_http_request_duration_seconds histogram",
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"}',
+            'yatube_db_queries_per_request_count{view="posts:index"}',
+            'yatube_cache_requests_total{prefix="generation",result="hit"}',
+            'yatube_cache_hit_ratio{prefix="generation"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+
+    def test_endpoint_access(self):
+        """/metrics открыт только персоналу, по токену и с разрешённых IP"""
+        url = reverse("metrics")
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        with override_settings(METRICS_TOKEN="secret"):
+            for header, status in (
+                ("Bearer secret", 200),
+                ("Bearer wrong", 404),
+                ("secret", 404),
+            ):
+                with self.subTest(header=header):
+                    response = self.guest_client.get(
+                        url, HTTP_AUTHORIZATION=header
+                    )
+                    self.assertEqual(response.status_code, status)
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"]):
+            self.assertEqual(
+                self.guest_client.get(url, REMOTE_ADDR="10.0.0.1").status_code,
+                200,
+            )
+            self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.guest_client.force_login(staff)
+        self.assertEqual(self.guest_client.get(url).status_code, 200)
+
+    def test_thumbnails(self):
+        """Созданные миниатюры учитываются"""
+        user = User.objects.create_user(username="test_user")
+        small_gif = (
+            b"\x47\x49\x46\x38\x39\x61\x02\x00"
+            b"\x01\x00\x80\x00\x00\x00\x00\x00"
+            b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+            b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+            b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+            b"\x0A\x00\x3B"
+        )
+        post = Post.objects.create(
+            author=user,
+            text="Тестовый пост",
+            image=SimpleUploadedFile(
+                name="small.gif", content=small_gif, content_type="image/gif"
+            ),
+        )
+        key = ("yatube_thumbnail_generation_seconds", "_count", ())
+        before = metrics.collect()[key]
+        get_thumbnail(post.image, "10x10")
+        get_thumbnail(post.image, "10x10")
+        self.assertEqual(metrics.collect()[key], before + 1)
+
+    def test_cache_prefix(self):
+        """Префикс ключа кеша — его начальные буквы"""
+        self.assertEqual(
+            metrics.cache_prefix("generation:posts"), "generation"
+        )
+        self.assertEqual(
+            metrics.cache_prefix("sorl-thumbnail||image||1"), "sorl-thumbnail"
+        )
+        self.assertEqual(metrics.cache_prefix("42"), "other")
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..middleware.profiling import ProfilingMiddleware
+from ..profiling import ProfileStore, StackSampler
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_sampler(self):
+        """Сэмплер собирает стеки наблюдаемого потока"""
+        sampler = StackSampler(0.001)
+        sampler.watch(threading.get_ident())
+        time.sleep(0.05)
+        stacks = sampler.unwatch(threading.get_ident())
+        self.assertGreater(sum(stacks.values()), 0)
+        self.assertTrue(
+            all("test_sampler" in stack for stack in stacks),
+            "В стеках нет тестовой функции",
+        )
+
+    def test_unwatched_stacks_are_left_alone(self):
+        """Отданные unwatch стеки сэмплер больше не меняет"""
+        sampler = StackSampler(0.001)
+        other = threading.Thread(target=time.sleep, args=(0.2,))
+        other.start()
+        self.addCleanup(other.join)
+        sampler.watch(other.ident)
+        sampler.watch(threading.get_ident())
+        time.sleep(0.05)
+        stacks = sampler.unwatch(threading.get_ident())
+        before = dict(stacks)
+        time.sleep(0.05)
+        self.assertEqual(dict(stacks), before)
+        self.assertGreater(sum(sampler.unwatch(other.ident).values()), 0)
+
+    def test_ring_buffer(self):
+        """В кольцевом буфере остаются только последние профили"""
+        store = ProfileStore(self.directory, 3)
+        names = [
+            store.save({"duration_ms": num}, Counter({"a;b": num}))
+            for num in range(5)
+        ]
+        captures = store.load()
+        self.assertEqual(
+            [capture["name"] for capture in captures], names[2:]
+        )
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    def test_disabled(self):
+        """PROFILING_SLOW_MS = 0 отключает профилирование"""
+        with override_settings(PROFILING_SLOW_MS=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: HttpResponse())
+
+    def test_save_errors(self):
+        """Ошибка сохранения профиля не ломает запрос"""
+        path = os.path.join(self.directory, "file")
+        open(path, "w").close()
+        cache.clear()
+        with override_settings(PROFILING_SLOW_MS=1, PROFILING_DIR=path):
+            with self.assertLogs("core.middleware.profiling", "ERROR"):
+                response = Client().get(reverse("posts:index"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_unsampled_requests(self):
+        """Медленный запрос вне выборки сохраняется без стеков"""
+        with override_settings(
+            PROFILING_SLOW_MS=1,
+            PROFILING_SAMPLE_RATE=0,
+            PROFILING_DIR=self.directory,
+        ):
+            cache.clear()
+            Client().get(reverse("posts:index"))
+
+        (capture,) = ProfileStore(self.directory, 10).load()
+        self.assertEqual(capture["view"], "posts:index")
+        self.assertEqual(capture["samples"], 0)
+
+    def test_slow_requests(self):
+        """Медленные запросы сохраняются, следующий запрос view — с cProfile"""
+        with override_settings(
+            PROFILING_SLOW_MS=1, PROFILING_DIR=self.directory
+        ):
+            guest_client = Client()
+            for _ in range(2):
+                cache.clear()
+                guest_client.get(reverse("posts:index"), {"cursor": "x"})
+
+            captures = ProfileStore(self.directory, 10).load()
+            self.assertEqual(
+                [capture["cprofile"] for capture in captures],
+                [False, True],
+            )
+            for capture in captures:
+                with self.subTest(name=capture["name"]):
+                    self.assertEqual(capture["view"], "posts:index")
+                    self.assertEqual(capture["query"], {"cursor": "x"})
+                    self.assertGreater(capture["timing"]["total_ms"], 0)
+
+            listing = StringIO()
+            call_command("profiles", stdout=listing)
+            self.assertEqual(len(listing.getvalue().splitlines()), 2)
+            aggregate = StringIO()
+            call_command("profiles", aggregate=True, stdout=aggregate)
+            self.assertIn("posts:index: 2 requests", aggregate.getvalue())
+            self.assertIn("cProfile of 1 requests", aggregate.getvalue())
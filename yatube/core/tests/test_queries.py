@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..middleware.query_budget import QueryBudgetMiddleware
+from ..queries import QueryBudgetExceeded, assert_query_budget, query_budget
+
+User = get_user_model()
+
+
+@query_budget(1)
+def view(request):
+    for _ in range(2):
+        User.objects.count()
+    return HttpResponse()
+
+
+class QueryBudgetTest(TestCase):
+    def test_assert_query_budget(self):
+        """Превышение бюджета запросов приводит к ошибке"""
+        with assert_query_budget(1):
+            User.objects.count()
+        with self.assertRaises(QueryBudgetExceeded):
+            with assert_query_budget(1):
+                view(None)
+
+    @override_settings(DEBUG=True)
+    def test_middleware(self):
+        """Middleware проверяет бюджет GET-запросов к view"""
+        factory = RequestFactory()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryBudgetMiddleware(get_response)
+        with self.assertRaises(QueryBudgetExceeded):
+            middleware(factory.get("/"))
+        self.assertEqual(middleware(factory.post("/")).status_code, 200)
+
+    def test_middleware_needs_debug(self):
+        """Без DEBUG middleware отключается"""
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(lambda request: HttpResponse())
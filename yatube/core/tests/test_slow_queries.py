@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Post, User
+from rest_framework import serializers
+
+from ..slow_queries import LogHandler, SlowQueryRecorder
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field="username", read_only=True
+    )
+
+    class Meta:
+        model = Post
+        fields = ("text", "author")
+
+
+class SlowQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.post = Post.objects.create(text="Тестовый пост", author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.user, text="Да")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def records(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    @override_settings(SLOW_QUERY_MS=1e-6)
+    def test_slow_query_attribution(self):
+        """Медленный запрос связан с view, кодом и узлом шаблона"""
+        url = reverse("posts:post_detail", kwargs={"post_id": self.post.pk})
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            Client().get(url)
+
+        records = [
+            record
+            for record in self.records(logs)
+            if record["view"] == "posts:post_detail"
+        ]
+        self.assertTrue(records, "Запросы страницы поста не записаны")
+        for record in records:
+            with self.subTest(sql=record["sql"]):
+                self.assertEqual(record["kind"], "slow")
+                self.assertEqual(record["path"], url)
+                self.assertTrue(record["frame"].startswith("posts/"))
+        self.assertIn(
+            "includes/comment_form.html",
+            " ".join(str(record["template"]) for record in records),
+        )
+
+    @override_settings(SLOW_QUERY_MS=1e-6)
+    def test_params(self):
+        """Параметры запросов пишутся в журнал только по настройке"""
+        client = Client()
+        client.force_login(self.user)
+        session_key = client.session.session_key
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            client.get(reverse("posts:index"))
+        self.assertNotIn(session_key, "".join(logs.output))
+        for record in self.records(logs):
+            self.assertNotIn("params", record)
+
+        with override_settings(SLOW_QUERY_LOG_PARAMS=True):
+            with self.assertLogs("core.slow_queries", "WARNING") as logs:
+                client.get(reverse("posts:index"))
+        self.assertIn(session_key, "".join(logs.output))
+
+    @override_settings(SLOW_QUERY_MS=1e-6)
+    def test_serializer_field(self):
+        """Запрос поля сериализатора указывает на это поле"""
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(SlowQueryRecorder()):
+                AuthorSerializer(post).data
+
+        (record,) = self.records(logs)
+        self.assertEqual(record["serializer"], "AuthorSerializer.author")
+        self.assertIn("test_slow_queries.py", record["frame"])
+
+    @override_settings(SLOW_QUERY_REPEATS=3)
+    def test_repeated_queries(self):
+        """Повторяющийся запрос записывается один раз, с числом повторов"""
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(SlowQueryRecorder()):
+                for _ in range(5):
+                    list(User.objects.filter(pk=self.user.pk))
+                User.objects.filter(pk=0).exists()
+
+        (record,) = self.records(logs)
+        self.assertEqual(record["kind"], "repeated")
+        self.assertEqual(record["executions"], 3)
+        self.assertEqual(record["duplicates"], 3)
+        self.assertIn("test_repeated_queries", record["frame"])
+
+    @override_settings(SLOW_QUERY_MS=1e-6, SLOW_QUERY_EXPLAIN=True)
+    def test_explain(self):
+        """К медленному SELECT прикладывается план запроса"""
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(SlowQueryRecorder()):
+                list(Post.objects.filter(author=self.user))
+
+        (record,) = self.records(logs)
+        self.assertTrue(record["plan"])
+
+
+class LogHandlerTest(TestCase):
+    def test_follows_setting(self):
+        """Журнал пишется в файл из текущего значения SLOW_QUERY_LOG"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        handler = LogHandler()
+        self.addCleanup(handler.close)
+        record = logging.makeLogRecord({"msg": "запись"})
+
+        for name in ("first", "second"):
+            path = os.path.join(directory.name, name, "slow.log")
+            with override_settings(SLOW_QUERY_LOG=path):
+                handler.emit(record)
+            with self.subTest(name=name), open(path) as file:
+                self.assertEqual(file.read(), "запись\n")
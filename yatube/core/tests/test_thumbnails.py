@@ -0,0 +1,189 @@
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import features
+from posts.models import Post, User
+from sorl.thumbnail import default
+
+from .. import metrics, thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+GENERATED = ("yatube_thumbnail_generation_seconds", "_count", ())
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, METRICS_DIR=TEMP_METRICS_DIR)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def image(self):
+        return SimpleUploadedFile(
+            name="small.gif", content=SMALL_GIF, content_type="image/gif"
+        )
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user, text="Тестовый пост", image=self.image()
+        )
+
+    def kvstore_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        return [
+            query["sql"]
+            for query in queries
+            if "thumbnail_kvstore" in query["sql"]
+        ]
+
+    def test_created_on_save(self):
+        """Миниатюры создаются при сохранении поста"""
+        post = self.create_post()
+        thumbnail = thumbnails.lookup(post.image, "post")
+        self.assertIsNotNone(thumbnail)
+
+        before = metrics.collect()[GENERATED]
+        response = self.guest_client.get(reverse("posts:index"))
+        self.assertContains(response, thumbnail.url)
+        self.assertEqual(metrics.collect()[GENERATED], before)
+
+    @override_settings(BACKGROUND_TASKS_ASYNC=True)
+    def test_placeholder(self):
+        """Пока миниатюры нет, страница показывает заглушку"""
+        # The task waits for a commit, which never comes in a TestCase.
+        post = self.create_post()
+        before = metrics.collect()[GENERATED]
+        for url in (
+            reverse("posts:index"),
+            reverse("posts:post_detail", kwargs={"post_id": post.pk}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'src="data:image/svg+xml,')
+        self.assertEqual(metrics.collect()[GENERATED], before)
+
+        self.assertEqual(
+            thumbnails.generate(post.image.name),
+            len(thumbnails.variants("post")),
+        )
+        self.assertEqual(thumbnails.generate(post.image.name), 0)
+        response = self.guest_client.get(reverse("posts:index"))
+        self.assertContains(
+            response, thumbnails.lookup(post.image, "post").url
+        )
+
+    def test_render_never_generates(self):
+        """Без фоновых задач страница не создаёт миниатюры сама"""
+        with mock.patch.object(thumbnails, "queue"):
+            post = self.create_post()
+        self.assertIsNone(thumbnails.lookup(post.image, "post"))
+        with mock.patch.object(thumbnails, "generate") as generate:
+            for url in (
+                reverse("posts:index"),
+                reverse("posts:post_detail", kwargs={"post_id": post.pk}),
+            ):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(url)
+                    self.assertContains(response, 'src="data:image/svg+xml,')
+        generate.assert_not_called()
+
+    def test_placeholder_size(self):
+        """Заглушка повторяет размер миниатюры"""
+        placeholder = thumbnails.Placeholder("960x339")
+        self.assertEqual((placeholder.width, placeholder.height), (960, 339))
+        self.assertIn("width%3D%22960%22", placeholder.url)
+        self.assertEqual(thumbnails.Placeholder("100").height, 100)
+
+    def test_page_lookups(self):
+        """Миниатюры страницы ищутся одним запросом, затем в памяти"""
+        for _ in range(3):
+            self.create_post()
+        cache.clear()
+        default.kvstore.clear_local()
+
+        self.assertEqual(len(self.kvstore_queries(reverse("posts:index"))), 1)
+        cache.clear()
+        self.assertEqual(self.kvstore_queries(reverse("posts:index")), [])
+
+    def test_forget(self):
+        """Миниатюры заменённой и удалённой картинки забываются"""
+        post = self.create_post()
+        image = post.image.name
+        post.image = self.image()
+        post.save()
+        self.assertIsNone(thumbnails.lookup(image, "post"))
+        self.assertIsNotNone(thumbnails.lookup(post.image, "post"))
+
+        image = post.image.name
+        post.delete()
+        self.assertIsNone(thumbnails.lookup(image, "post"))
+
+    def test_variants(self):
+        """Миниатюры нарезаются по ширинам и форматам, исходная — последней"""
+        with mock.patch.object(thumbnails, "_writable", return_value=True):
+            variants = thumbnails.variants("post")
+        self.assertEqual(
+            [(variant.width, variant.format) for variant in variants],
+            [
+                (320, "WEBP"),
+                (480, "WEBP"),
+                (720, "WEBP"),
+                (960, "WEBP"),
+                (320, None),
+                (480, None),
+                (720, None),
+                (960, None),
+            ],
+        )
+        self.assertEqual(variants[0].geometry, "320x113")
+        self.assertEqual(variants[-1].geometry, "960x339")
+        self.assertEqual(variants[0].options["crop"], "center")
+
+    def test_srcset(self):
+        """Картинка выводится с srcset всех ширин"""
+        post = self.create_post()
+        response = self.guest_client.get(reverse("posts:index"))
+        picture = thumbnails.get(post.image, "post")
+        self.assertContains(response, f'srcset="{picture.srcset}"')
+        for width in ("320w", "480w", "720w", "960w"):
+            with self.subTest(width=width):
+                self.assertIn(width, picture.srcset)
+        self.assertTrue(picture.url.endswith(".gif"))
+
+    @skipUnless(features.check("webp"), "Pillow is built without WebP")
+    def test_webp(self):
+        """WebP выводится отдельным источником <picture>"""
+        self.create_post()
+        response = self.guest_client.get(reverse("posts:index"))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, ".webp 320w")
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timing
+
+
+class TimingsTest(TestCase):
+    @mock.patch("core.timing.time")
+    def test_exclusive_phases(self, time):
+        """Вложенная фаза не учитывается во времени внешней"""
+        time.perf_counter.side_effect = [0, 1, 3, 4, 6, 10]
+        timings = timing.Timings()
+        activated = timing.activate(timings)
+        try:
+            with timing.phase("template"):
+                with timing.phase("db"):
+                    pass
+        finally:
+            timing.deactivate(activated)
+
+        summary = timings.summary()
+        self.assertEqual(summary["template_ms"], 4000)
+        self.assertEqual(summary["db_ms"], 1000)
+        self.assertEqual(summary["total_ms"], 10000)
+        self.assertEqual(summary["app_ms"], 5000)
+
+    def test_outside_request(self):
+        """Вне запроса замеры ничего не делают"""
+        with timing.phase("db"):
+            timing.count(queries=1)
+        self.assertEqual(timing.timed("db")(len)("abc"), 3)
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_header_and_log(self):
+        """Ответ несёт Server-Timing, а в журнал пишется строка с view"""
+        with self.assertLogs("core.middleware.server_timing", "INFO") as logs:
+            response = self.guest_client.get(reverse("posts:index"))
+
+        header = response["Server-Timing"]
+        for name in ("db", "cache", "template", "app", "total"):
+            with self.subTest(name=name):
+                self.assertIn(f"{name};dur=", header)
+        (record,) = logs.records
+        self.assertEqual(record.view, "posts:index")
+        self.assertGreater(record.timing["queries"], 0)
+        self.assertGreater(record.timing["cache_misses"], 0)
+        self.assertGreater(record.timing["template_ms"], 0)
+        self.assertIn("view=posts:index", record.getMessage())
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_disabled(self):
+        """Заголовок можно отключить настройкой"""
+        response = self.guest_client.get(reverse("posts:index"))
+        self.assertNotIn("Server-Timing", response)
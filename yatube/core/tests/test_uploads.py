@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.models import Post, User
+
+from .. import images
+from ..uploads import CappedUploadHandler
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size, image_format, mode="RGB"):
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).convert(mode).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, UPLOAD_MAX_BYTES=4096)
+class UploadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_handler_cap(self):
+        """Файл пишется на диск только до предела"""
+        handler = CappedUploadHandler()
+        handler.new_file("image", "big.jpg", "image/jpeg", None)
+        for start in range(0, 10_000, 1000):
+            handler.receive_data_chunk(b"x" * 1000, start)
+        upload = handler.file_complete(10_000)
+        self.addCleanup(upload.close)
+
+        self.assertTrue(upload.truncated)
+        self.assertEqual(upload.size, 10_000)
+        self.assertEqual(os.path.getsize(upload.temporary_file_path()), 4096)
+        with self.assertRaisesMessage(ValidationError, "слишком большой"):
+            images.validate_upload(upload)
+
+    def test_oversize_upload(self):
+        """Слишком большой файл отклоняется формой и API"""
+        content = image_bytes((200, 200), "JPEG")
+        self.assertGreater(len(content), 4096)
+        response = self.authorized_client.post(
+            reverse("post_create"),
+            {
+                "text": "Пост",
+                "image": SimpleUploadedFile("big.jpg", content),
+            },
+        )
+        self.assertFormError(
+            response,
+            "form",
+            "image",
+            "Файл слишком большой: можно не больше 4,0\xa0КБ",
+        )
+
+        response = self.authorized_client.post(
+            reverse("posts:api_posts-list"),
+            {
+                "text": "Пост",
+                "author": self.user.pk,
+                "image": SimpleUploadedFile("big.png", content),
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.json())
+        self.assertFalse(Post.objects.exists())
+
+    def test_small_upload(self):
+        """Файл в пределах лимита сохраняется"""
+        response = self.authorized_client.post(
+            reverse("post_create"),
+            {
+                "text": "Пост",
+                "image": SimpleUploadedFile(
+                    "small.png", image_bytes((10, 10), "PNG")
+                ),
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.get().image.name.endswith(".jpg"))
+
+    def test_header_only(self):
+        """Формат и размер проверяются по заголовку, без декодирования"""
+        bmp = SimpleUploadedFile("image.bmp", image_bytes((10, 10), "BMP"))
+        png = SimpleUploadedFile("image.png", image_bytes((10, 10), "PNG"))
+        with mock.patch.object(Image.Image, "load") as load:
+            with self.assertRaisesMessage(ValidationError, "BMP"):
+                images.validate_upload(bmp)
+            with override_settings(IMAGE_UPLOAD_MAX_PIXELS=99):
+                with self.assertRaisesMessage(ValidationError, "пикселей"):
+                    images.validate_upload(png)
+        load.assert_not_called()
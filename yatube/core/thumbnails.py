@@ -0,0 +1,213 @@
+"""Responsive thumbnails generated off the request path.
+
+``THUMBNAIL_PRESETS`` names every geometry the templates show. Each preset
+also comes in the ``THUMBNAIL_SRCSET_WIDTHS`` narrower than itself, and in
+each of ``THUMBNAIL_SRCSET_FORMATS`` the installed Pillow can write (WebP)
+besides the format of the source. ``queue`` creates all of them for an
+image in a background task (``core.tasks``), and ``{% picture %}``
+(``core.templatetags.thumbnails``) only looks them up: until the preset
+itself exists the image renders as a ``Placeholder`` of the same size and
+is queued, so pages never decode images. Renders queue only with
+``BACKGROUND_TASKS_ASYNC`` on; without a worker to run them, thumbnails
+come from saving the post alone. Once thumbnails are created,
+pages cached under the ``posts`` namespace are invalidated to show them.
+``{% prefetch_thumbnails %}`` looks up a whole page at once.
+"""
+import functools
+import logging
+from typing import List, NamedTuple, Optional
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import features
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import caching
+from .tasks import defer
+
+logger = logging.getLogger(__name__)
+
+QUEUED_PREFIX = "thumbnail-queued"
+# A failed generation is retried by a later render after this long.
+QUEUED_TIMEOUT = 60
+PLACEHOLDER_COLOR = "#e9ecef"
+
+
+class Variant(NamedTuple):
+    width: int
+    # None for the format of the source.
+    format: Optional[str]
+    geometry: str
+    options: dict
+
+
+class Placeholder:
+    """Stands in for thumbnails that are not created yet."""
+
+    is_placeholder = True
+    sources = ()
+    srcset = ""
+
+    def __init__(self, geometry_string: str):
+        width, height = parse_geometry(geometry_string)
+        self.width = width or height
+        self.height = height or width
+
+    @property
+    def url(self) -> str:
+        svg = (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" '
+            f'height="{self.height}"><rect width="100%" height="100%" '
+            f'fill="{PLACEHOLDER_COLOR}"/></svg>'
+        )
+        return f"data:image/svg+xml,{quote(svg)}"
+
+
+def _srcset(thumbnails) -> str:
+    return ", ".join(
+        f"{thumbnail.url} {thumbnail.width}w" for thumbnail in thumbnails
+    )
+
+
+class Picture:
+    """Thumbnails of a preset as ``<picture>`` sources and a fallback."""
+
+    is_placeholder = False
+
+    def __init__(self, found: dict):
+        fallback = found.pop(None)
+        self.sources = [
+            {"type": f"image/{format_.lower()}", "srcset": _srcset(images)}
+            for format_, images in found.items()
+        ]
+        self.srcset = _srcset(fallback)
+        self.url = fallback[-1].url
+        self.width = fallback[-1].width
+        self.height = fallback[-1].height
+
+
+@functools.lru_cache(maxsize=None)
+def _writable(format_: str) -> bool:
+    return bool(features.check(format_.lower()))
+
+
+def variants(preset: str) -> List[Variant]:
+    """Every thumbnail of *preset*, narrowest first, the preset last."""
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    width, height = parse_geometry(geometry)
+    widths = [w for w in settings.THUMBNAIL_SRCSET_WIDTHS if w < width]
+    formats = [
+        format_
+        for format_ in settings.THUMBNAIL_SRCSET_FORMATS
+        if _writable(format_)
+    ]
+    result = [
+        Variant(
+            w,
+            format_,
+            f"{w}x{round(height * w / width)}" if height else str(w),
+            {**options, "format": format_},
+        )
+        for format_ in formats
+        for w in widths + [width]
+    ]
+    result.extend(
+        Variant(
+            w,
+            None,
+            f"{w}x{round(height * w / width)}" if height else str(w),
+            options,
+        )
+        for w in widths
+    )
+    result.append(Variant(width, None, geometry, options))
+    return result
+
+
+def _cached(file_, variant: Variant):
+    return default.backend.get_cached(
+        file_, variant.geometry, **variant.options
+    )
+
+
+def lookup(file_, preset: str):
+    """The thumbnail of *preset* itself, or None if it is missing."""
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    return default.backend.get_cached(file_, geometry, **options)
+
+
+def prefetch(files, preset: str) -> None:
+    """Load the thumbnails of *files* at once, if the key-value store can."""
+    if not hasattr(default.kvstore, "prefetch"):
+        return
+    default.kvstore.prefetch(
+        add_prefix(
+            default.backend.thumbnail_file(
+                file_, variant.geometry, **variant.options
+            ).key
+        )
+        for file_ in files
+        if file_
+        for variant in variants(preset)
+    )
+
+
+def generate(name: str) -> int:
+    """Create the missing thumbnails of the image *name*, return how many."""
+    missing = [
+        variant
+        for preset in settings.THUMBNAIL_PRESETS
+        for variant in variants(preset)
+        if _cached(name, variant) is None
+    ]
+    created = 0
+    if missing:
+        default.backend.get_thumbnails(
+            name, [(variant.geometry, variant.options) for variant in missing]
+        )
+        created = sum(
+            _cached(name, variant) is not None for variant in missing
+        )
+    if created:
+        caching.bump("posts")
+    logger.info("Created %s thumbnails of %s", created, name)
+    return created
+
+
+def queue(name: str) -> None:
+    """Generate the thumbnails of *name* in the background, once at a time."""
+    if cache.add(f"{QUEUED_PREFIX}:{name}", True, QUEUED_TIMEOUT):
+        defer(generate, name)
+
+
+def forget(name: str) -> None:
+    """Drop the thumbnails of the image *name* once the transaction commits.
+
+    The image file itself stays.
+    """
+    defer(delete, name, delete_file=False)
+
+
+def get(file_, preset: str):
+    """The picture, or a placeholder while its thumbnails are created."""
+    if not file_:
+        return None
+    found = {}
+    complete = True
+    for variant in variants(preset):
+        thumbnail = _cached(file_, variant)
+        if thumbnail is None:
+            complete = False
+        else:
+            found.setdefault(variant.format, []).append(thumbnail)
+    if not complete:
+        if settings.BACKGROUND_TASKS_ASYNC:
+            # Inline tasks would decode the image inside the render.
+            queue(file_.name)
+        if thumbnail is None:
+            # The preset itself comes last.
+            return Placeholder(settings.THUMBNAIL_PRESETS[preset][0])
+    return Picture(found)
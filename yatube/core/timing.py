@@ -0,0 +1,119 @@
+"""Per-request time spent in SQL, the cache, templates and the rest.
+
+``core.middleware.server_timing.ServerTimingMiddleware`` activates a
+``Timings`` for every request. Instrumented code (database cursors, the
+tiered cache, the template backend) reports to it through ``phase`` and
+``count``, which cost a context variable lookup and do nothing outside a
+request. Phases are exclusive: a query run while a template renders counts
+as SQL only, so the phases and the remaining Python time add up to the
+total.
+"""
+import functools
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from .queries import is_bookkeeping
+
+PHASES = ("db", "cache", "template")
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        # [phase, moment it last started accruing] of the open phases.
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self.durations[outer[0]] += now - outer[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            name, started = self._stack.pop()
+            self.durations[name] += now - started
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def execute(self, execute, sql, params, many, context):
+        """``execute_wrapper`` timing the queries of the request."""
+        with self.phase("db"):
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                if not is_bookkeeping(sql):
+                    self.counts["queries"] += 1
+
+    def summary(self) -> dict:
+        """Milliseconds of each phase and counters, rounded for logs."""
+        total = time.perf_counter() - self.started
+        result = {"total_ms": round(total * 1000, 2)}
+        for name in PHASES:
+            result[f"{name}_ms"] = round(self.durations[name] * 1000, 2)
+        result["app_ms"] = round(
+            max(total - sum(self.durations[name] for name in PHASES), 0)
+            * 1000,
+            2,
+        )
+        for name in ("queries", "cache_hits", "cache_misses"):
+            result[name] = self.counts[name]
+        return result
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def activate(timings: Timings):
+    return _current.set(timings)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[Timings]:
+    """Timings of the request being served, if any."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Count the enclosed block as *name* in the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+def timed(name: str) -> Callable:
+    """Decorator counting calls of the function as the phase *name*."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            with timings.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(**deltas: int) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.counts.update(deltas)
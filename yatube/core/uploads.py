@@ -0,0 +1,33 @@
+"""Upload handler keeping the memory of a worker flat under big uploads.
+
+Django keeps uploads under ``FILE_UPLOAD_MAX_MEMORY_SIZE`` in memory and
+the rest on disk without limit. ``CappedUploadHandler`` streams every file
+to a temporary file in chunks and stops writing after ``UPLOAD_MAX_BYTES``:
+the rest of an oversize file is read off the socket and dropped, and the
+file is marked ``truncated`` for ``core.images.validate_upload`` to reject.
+The body size as a whole is left to the front-end server.
+
+Usage::
+
+    FILE_UPLOAD_HANDLERS = ["core.uploads.CappedUploadHandler"]
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class CappedUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # Past the cap only the head is kept, enough to tell what it was.
+        room = settings.UPLOAD_MAX_BYTES - self.received
+        self.received += len(raw_data)
+        if room > 0:
+            self.file.write(raw_data[:room])
+
+    def file_complete(self, file_size):
+        file_ = super().file_complete(file_size)
+        file_.truncated = self.received > settings.UPLOAD_MAX_BYTES
+        return file_
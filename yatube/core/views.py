@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as metrics_registry
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,25 @@ def handler403(request, *args, **kwargs):
 
 def csrf_failure(request, reason=""):
     return render(request, "core/403csrf.html")
+
+
+def _metrics_allowed(request) -> bool:
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}"
+    ):
+        return True
+    return (
+        request.user.is_staff
+        or request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request):
+    """Prometheus metrics, for staff, ``METRICS_TOKEN`` and allowed IPs."""
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        metrics_registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,92 @@
+"""Denormalized counters of posts, comments and subscriptions.
+
+Counters are shifted with ``UPDATE ... SET x = x + 1`` inside the
+transaction that creates or deletes the counted row, and ``recount()``
+rebuilds all of them with a handful of set-based statements.
+"""
+from core import bulk
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def _subquery_count(queryset, field: str):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _user_counts(user_id: int) -> dict:
+    return {
+        "posts_count": Post.objects.filter(author_id=user_id).count(),
+        "followers_count": Follow.objects.filter(author_id=user_id).count(),
+        "following_count": Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def get_counters(user: User) -> UserCounters:
+    """Counters of the user, created from scratch if they are missing."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters, _ = UserCounters.objects.get_or_create(
+            user=user, defaults=_user_counts(user.pk)
+        )
+        return counters
+
+
+def shift_user(user_id: int, field: str, delta: int) -> None:
+    """Shift a user counter; missing rows are filled by ``get_counters``."""
+    UserCounters.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+
+
+def shift_group(group_id: int, delta: int) -> None:
+    Group.objects.filter(pk=group_id).update(
+        posts_count=F("posts_count") + delta
+    )
+
+
+def shift_post(post_id: int, delta: int) -> None:
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F("comments_count") + delta
+    )
+
+
+@transaction.atomic
+def recount() -> None:
+    """Recompute every counter from the counted tables."""
+    existing = UserCounters.objects.values("pk")
+    bulk.bulk_create(
+        UserCounters,
+        (
+            UserCounters(user_id=user_id)
+            for user_id in User.objects.exclude(pk__in=existing)
+            .values_list("pk", flat=True)
+            .iterator()
+        ),
+    )
+
+    # UserCounters.pk is the user id, so the same subqueries fit all.
+    UserCounters.objects.update(
+        posts_count=_subquery_count(Post.objects.all(), "author"),
+        followers_count=_subquery_count(Follow.objects.all(), "author"),
+        following_count=_subquery_count(Follow.objects.all(), "user"),
+    )
+    Group.objects.update(
+        posts_count=_subquery_count(Post.objects.all(), "group")
+    )
+    Post.objects.update(
+        comments_count=_subquery_count(Comment.objects.all(), "post")
+    )
@@ -1,3 +1,5 @@
+from core import images
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
 from .models import Comment, Post
@@ -9,6 +11,20 @@ class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ("text", "group", "image")
+        # A file cut at UPLOAD_MAX_BYTES may not even open.
+        error_messages = {
+            "image": {"invalid_image": images.INVALID_IMAGE_MESSAGE}
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["image"].validators.append(images.validate_upload)
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
 
 
 class CommentForm(ModelForm):
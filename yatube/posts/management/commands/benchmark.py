@@ -0,0 +1,322 @@
+"""Measure the main pages and API endpoints on seeded data sets.
+
+Every data set size is seeded (see the ``seed`` command) into a test
+database, and each view is requested through the test client: the command
+reports latency percentiles, the number and time of SQL queries and the
+response size. Results are written as JSON; given the JSON of an earlier
+run as ``--baseline``, the command fails on every metric that got worse,
+so regressions are caught before deploy.
+
+The run has a cache, metrics and profiles of its own: clearing the cache
+before each request, or caching pages of seeded data, must not touch the
+cache of the site served from the same host.
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from io import StringIO
+from typing import Dict, List
+
+import django
+from core.queries import is_bookkeeping
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+# Rows of each data set: the small one times the scale.
+DATASET = {
+    "users": 100,
+    "groups": 10,
+    "tags": 50,
+    "posts": 1_000,
+    "comments": 2_000,
+    "follows": 1_000,
+}
+SCALES = {"small": 1, "medium": 10, "large": 100}
+# Metrics compared with the baseline within the tolerance; the number of
+# queries must never grow. p99 of a few dozen requests is too noisy.
+TIMINGS = ("p50_ms", "p95_ms", "sql_ms")
+MIN_DELTA_MS = 2.0
+PRIVATE_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    },
+}
+
+
+class QueryTimer:
+    """``execute_wrapper`` counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            if not is_bookkeeping(sql):
+                self.count += 1
+
+
+def percentile(sorted_values: List[float], percent: int) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    rank = max(round(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def compare(
+    results: dict, baseline: dict, tolerance: float = 0.5
+) -> List[str]:
+    """Regressions of *results* against *baseline*, one line each."""
+    regressions = []
+    for size, views in results.items():
+        for view, metrics in views.items():
+            before = baseline.get(size, {}).get(view)
+            if before is None:
+                continue
+            label = f"{size} {view}"
+            if metrics["queries"] > before["queries"]:
+                regressions.append(
+                    f"{label}: queries {before['queries']} "
+                    f"-> {metrics['queries']}"
+                )
+            for name in TIMINGS:
+                allowed = max(before[name] * tolerance, MIN_DELTA_MS)
+                if metrics[name] - before[name] > allowed:
+                    regressions.append(
+                        f"{label}: {name} {before[name]:.1f} "
+                        f"-> {metrics[name]:.1f}"
+                    )
+            if metrics["bytes"] > before["bytes"] * (1 + tolerance):
+                regressions.append(
+                    f"{label}: bytes {before['bytes']} -> {metrics['bytes']}"
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Measure latency and SQL queries of the main views"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            choices=SCALES,
+            default=["small", "medium"],
+            help="Data sets to seed and measure",
+        )
+        parser.add_argument(
+            "--current-db",
+            action="store_true",
+            help="Measure the current database instead of seeded ones",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="Measured requests of each view",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Requests of each view made before measuring",
+        )
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the cache between requests instead of clearing it",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            default=os.path.join(settings.BASE_DIR, "var", "benchmark.json"),
+            help="Where to write the results",
+        )
+        parser.add_argument(
+            "--baseline", help="Results of an earlier run to compare with"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed relative growth of timings and response sizes",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be positive")
+        self.options = options
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+
+        with tempfile.TemporaryDirectory() as scratch, override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=["testserver"],
+            CACHES=PRIVATE_CACHES,
+            # The measured database lives on the primary only.
+            DATABASE_REPLICAS=[],
+            METRICS_DIR=os.path.join(scratch, "metrics"),
+            PROFILING_DIR=os.path.join(scratch, "profiles"),
+            SLOW_QUERY_LOG=os.path.join(scratch, "slow_queries.log"),
+        ):
+            if options["current_db"]:
+                results = {"current": self.run()}
+            else:
+                results = self.run_datasets(options["sizes"])
+
+        report = {
+            "meta": {
+                "created": datetime.datetime.now(
+                    datetime.timezone.utc
+                ).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "requests": options["requests"],
+                "warm_cache": options["warm_cache"],
+                "seed": options["seed"],
+            },
+            "results": results,
+        }
+        directory = os.path.dirname(options["output"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f"Results are written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(
+                results, baseline["results"], options["tolerance"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Regressions against the baseline:\n"
+                    + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions"))
+
+    def run_datasets(self, sizes: List[str]) -> dict:
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            results = {}
+            for size in sizes:
+                call_command("flush", interactive=False, verbosity=0)
+                call_command(
+                    "seed",
+                    **{
+                        name: rows * SCALES[size]
+                        for name, rows in DATASET.items()
+                    },
+                    seed=self.options["seed"],
+                    stdout=StringIO(),
+                )
+                self.stdout.write(f"Data set '{size}':")
+                results[size] = self.run()
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def targets(self) -> Dict[str, str]:
+        """URLs of the measured views on the busiest rows."""
+        urls = {"index": reverse("posts:index")}
+        group = Group.objects.order_by("-posts_count").first()
+        if group is not None:
+            urls["group_posts"] = reverse(
+                "posts:group_list", kwargs={"slug": group.slug}
+            )
+        author = User.objects.order_by("-counters__posts_count").first()
+        if author is not None:
+            urls["profile"] = reverse(
+                "posts:profile", kwargs={"username": author.username}
+            )
+        post = Post.objects.order_by("-comments_count").first()
+        if post is not None:
+            urls["post_detail"] = reverse(
+                "posts:post_detail", kwargs={"post_id": post.pk}
+            )
+        urls["follow_index"] = reverse("posts:follow_index")
+        urls["api_posts"] = reverse("posts:api_posts-list")
+        if post is not None:
+            urls["api_post"] = reverse(
+                "posts:api_posts-detail", kwargs={"pk": post.pk}
+            )
+        return urls
+
+    def run(self) -> dict:
+        client = Client()
+        # The follow feed is the heaviest for the user following the most.
+        follower = User.objects.order_by("-counters__following_count").first()
+        results = {}
+        for view, url in self.targets().items():
+            if view == "follow_index":
+                if follower is None:
+                    continue
+                client.force_login(follower)
+            results[view] = self.measure(client, url)
+            client.logout()
+            self.write_row(view, results[view])
+        return results
+
+    def measure(self, client: Client, url: str) -> dict:
+        latencies = []
+        sql_times = []
+        queries = []
+        sizes = []
+        warmup = self.options["warmup"]
+        for num in range(warmup + self.options["requests"]):
+            if not self.options["warm_cache"]:
+                cache.clear()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f"GET {url}: {response.status_code}")
+            if num < warmup:
+                continue
+            latencies.append(elapsed * 1000)
+            sql_times.append(timer.seconds * 1000)
+            queries.append(timer.count)
+            sizes.append(len(response.content))
+
+        latencies.sort()
+        return {
+            "url": url,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "queries": max(queries),
+            "sql_ms": statistics.median(sql_times),
+            "bytes": max(sizes),
+        }
+
+    def write_row(self, view: str, metrics: dict) -> None:
+        self.stdout.write(
+            f"  {view:<14}"
+            f" p50 {metrics['p50_ms']:7.1f} ms"
+            f" p95 {metrics['p95_ms']:7.1f} ms"
+            f" p99 {metrics['p99_ms']:7.1f} ms"
+            f" {metrics['queries']:3} queries"
+            f" sql {metrics['sql_ms']:6.1f} ms"
+            f" {metrics['bytes']:8} bytes"
+        )
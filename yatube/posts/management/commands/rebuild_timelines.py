@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuild subscription timelines from the Follow and Post tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Rebuild only timelines of these users",
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+
+        count = timeline.rebuild(users)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt timelines for {count} subscriptions")
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute post, comment and subscription counters"
+
+    def handle(self, *args, **options):
+        counters.recount()
+        self.stdout.write(self.style.SUCCESS("Counters are recomputed"))
@@ -0,0 +1,327 @@
+"""Fill a fresh database with a large, reproducible data set.
+
+Rows are generated lazily from pools of Faker texts and streamed into the
+tables in chunks with ``core.bulk.insert_rows``, bypassing model signals,
+so memory stays flat however many rows are asked for; timelines and
+denormalized counters are computed by the database at the end. Authors
+are picked from a power-law (Zipf) distribution, so a few of them write
+most of the posts and gather most of the followers, as on a real social
+network. The same ``--seed`` always produces the same rows, dated back
+from ``--now`` (a fixed date by default).
+"""
+import array
+import datetime
+import itertools
+import random
+import time
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from core import bulk, caching
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from faker import Faker
+from posts import counters
+from posts.models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    Tag,
+    TagPost,
+    TimelineEntry,
+    User,
+)
+
+# Faker is slow, so rows draw their texts from pools generated once.
+POOL_SIZE = 1000
+ZIPF_EXPONENT = 1.1
+# Posts and comments are spread over this period before --now.
+PERIOD = datetime.timedelta(days=365)
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+SQLITE_CACHE_KB = 256 * 1024
+# Draws per requested subscription before giving up on duplicates.
+MAX_DRAWS = 10
+
+
+def aware_datetime(value: str) -> datetime.datetime:
+    """ISO 8601 date and time, in UTC unless it has an offset."""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def zipf_weights(count: int) -> Sequence[float]:
+    """Cumulative power-law weights of *count* ranked items."""
+    return array.array(
+        "d",
+        itertools.accumulate(
+            1 / rank**ZIPF_EXPONENT for rank in range(1, count + 1)
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = "Fill the database with generated users, posts and subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--groups", type=int, default=100)
+        parser.add_argument("--tags", type=int, default=1_000)
+        parser.add_argument("--posts", type=int, default=100_000)
+        parser.add_argument("--comments", type=int, default=200_000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=100_000,
+            help="Number of subscriptions, fewer if users are too few",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the generated data"
+        )
+        parser.add_argument(
+            "--now",
+            type=aware_datetime,
+            default=EPOCH,
+            help="Date the data is dated back from (ISO 8601, default: "
+            f"{EPOCH.date()})",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10_000,
+            help="Rows generated and inserted at once",
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of every generated user",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.chunk_size = options["chunk_size"]
+        self.now = options["now"]
+        self.total = 0
+        started = time.monotonic()
+
+        fake = Faker("ru_RU")
+        fake.seed_instance(options["seed"])
+        self.first_names = [fake.first_name() for _ in range(POOL_SIZE)]
+        self.last_names = [fake.last_name() for _ in range(POOL_SIZE)]
+        self.words = [fake.word() for _ in range(POOL_SIZE)]
+        self.sentences = [fake.sentence() for _ in range(POOL_SIZE)]
+        self.paragraphs = [fake.paragraph() for _ in range(POOL_SIZE)]
+
+        if connection.vendor == "sqlite":
+            # Index pages of the growing tables stay in memory.
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KB}")
+
+        # Hashed once, with a salt of the seed, to keep the rows stable.
+        password = make_password(
+            options["password"], salt=f"seed{options['seed']}"
+        )
+        self.seed_users(options["users"], password)
+        self.seed_groups(options["groups"])
+        self.seed_tags(options["tags"])
+        self.seed_posts(options["posts"])
+        self.seed_comments(options["comments"])
+        self.seed_tag_posts()
+        self.seed_follows(options["follows"])
+        self.seed_timelines()
+        counters.recount()
+        caching.bump("posts", "groups", "users", "timelines")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inserted {self.total} rows in {elapsed:.1f}s "
+                f"({self.total / elapsed:.0f} rows/s)"
+            )
+        )
+
+    def insert(self, model, fields: Sequence[str], rows: Iterable) -> None:
+        """Insert generated *rows*, or those a queryset selects."""
+        started = time.monotonic()
+        with transaction.atomic():
+            if isinstance(rows, QuerySet):
+                count = bulk.insert_select(model, fields, rows)
+            else:
+                count = bulk.insert_rows(
+                    model, fields, rows, self.chunk_size
+                )
+        self.total += count
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{model.__name__}: {count} rows ({count / elapsed:.0f} rows/s)"
+        )
+
+    def pick(self, population: Sequence, cum_weights=None) -> Callable:
+        """Fast sampler of *population*, uniform or by *cum_weights*."""
+        buffer: Iterator = iter(())
+
+        def sample():
+            nonlocal buffer
+            try:
+                return next(buffer)
+            except StopIteration:
+                buffer = iter(
+                    self.random.choices(
+                        population, cum_weights=cum_weights, k=POOL_SIZE
+                    )
+                )
+                return next(buffer)
+
+        return sample
+
+    def ranked(self, population: Sequence) -> Callable:
+        """Power-law sampler over a shuffled copy of *population*."""
+        population = population[:]
+        self.random.shuffle(population)
+        return self.pick(population, zipf_weights(len(population)))
+
+    def adapt(self, value: datetime.datetime) -> Any:
+        """Database value of an aware UTC date."""
+        if connection.vendor == "sqlite":
+            # What adapt_datetimefield_value() makes of UTC dates, at a
+            # fraction of its cost.
+            return str(value.replace(tzinfo=None))
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def timeline(self, count: int) -> Iterator:
+        """*count* ascending dates over ``PERIOD``, like rows added live.
+
+        Ascending dates also keep index inserts close to each other.
+        """
+        step = PERIOD / max(count, 1)
+        start = self.now - PERIOD
+        for num in range(count):
+            yield self.adapt(start + step * (num + self.random.random()))
+
+    def ids(self, model) -> Sequence[int]:
+        return array.array(
+            "q",
+            model.objects.order_by("pk")
+            .values_list("pk", flat=True)
+            .iterator(),
+        )
+
+    def seed_users(self, count: int, password: str) -> None:
+        # Users are there before anything they could have written.
+        date_joined = self.adapt(self.now - PERIOD)
+        first_name = self.pick(self.first_names)
+        last_name = self.pick(self.last_names)
+        self.insert(
+            User,
+            (
+                "username",
+                "email",
+                "first_name",
+                "last_name",
+                "password",
+                "date_joined",
+            ),
+            (
+                (
+                    f"user{num}",
+                    f"user{num}@example.com",
+                    first_name(),
+                    last_name(),
+                    password,
+                    date_joined,
+                )
+                for num in range(count)
+            ),
+        )
+        self.user_ids = self.ids(User)
+
+    def seed_groups(self, count: int) -> None:
+        word = self.pick(self.words)
+        sentence = self.pick(self.sentences)
+        self.insert(
+            Group,
+            ("title", "slug", "description"),
+            (
+                (f"{word().capitalize()} {num}", f"group-{num}", sentence())
+                for num in range(count)
+            ),
+        )
+        self.group_ids = self.ids(Group)
+
+    def seed_tags(self, count: int) -> None:
+        word = self.pick(self.words)
+        self.insert(
+            Tag, ("name",), ((f"{word()[:24]}{num}",) for num in range(count))
+        )
+        self.tag_ids = self.ids(Tag)
+
+    def seed_posts(self, count: int) -> None:
+        author = self.ranked(self.user_ids)
+        group = self.pick([None, *self.group_ids])
+        paragraph = self.pick(self.paragraphs)
+        self.insert(
+            Post,
+            ("author", "created", "group", "text"),
+            (
+                (author(), created, group(), paragraph())
+                for created in self.timeline(count)
+            ),
+        )
+        self.post_ids = self.ids(Post)
+
+    def seed_comments(self, count: int) -> None:
+        if not self.post_ids:
+            return
+        post = self.ranked(self.post_ids)
+        author = self.pick(self.user_ids)
+        sentence = self.pick(self.sentences)
+        self.insert(
+            Comment,
+            ("text", "post", "author", "created"),
+            (
+                (sentence(), post(), author(), created)
+                for created in self.timeline(count)
+            ),
+        )
+
+    def seed_tag_posts(self) -> None:
+        if not self.tag_ids:
+            return
+        tag = self.ranked(self.tag_ids)
+        tags_per_post = self.pick([0, 0, 1, 1, 2, 3])
+        self.insert(
+            TagPost,
+            ("tag", "post"),
+            (
+                (tag_id, post_id)
+                for post_id in self.post_ids
+                for tag_id in sorted({tag() for _ in range(tags_per_post())})
+            ),
+        )
+
+    def seed_follows(self, count: int) -> None:
+        follows = set()
+        if len(self.user_ids) > 1:
+            user = self.pick(self.user_ids)
+            author = self.ranked(self.user_ids)
+            # Popular authors are drawn again and again; on a small user
+            # base the requested count may be out of reach.
+            for _ in range(count * MAX_DRAWS):
+                if len(follows) >= count:
+                    break
+                pair = user(), author()
+                if pair[0] != pair[1]:
+                    follows.add(pair)
+        self.insert(Follow, ("user", "author"), sorted(follows))
+
+    def seed_timelines(self) -> None:
+        self.insert(
+            TimelineEntry,
+            ("user", "post", "created"),
+            Follow.objects.filter(author__posts__isnull=False).values_list(
+                "user_id", "author__posts", "author__posts__created"
+            ),
+        )
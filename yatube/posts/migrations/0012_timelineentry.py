@@ -0,0 +1,93 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model("posts", "Follow")
+    Post = apps.get_model("posts", "Post")
+    TimelineEntry = apps.get_model("posts", "TimelineEntry")
+
+    for follow in Follow.objects.all().iterator():
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=follow.user_id, post_id=pk, created=created
+                )
+                for pk, created in Post.objects.filter(
+                    author_id=follow.author_id
+                ).values_list("pk", "created")
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0011_tag"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        help_text="Копия даты публикации поста для сортировки ленты",
+                        verbose_name="Дата и время публикации",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        help_text="Пост в ленте подписчика: автоматическое поле",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="posts.Post",
+                        verbose_name="Пост",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="Владелец ленты: автоматическое поле",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Подписчик",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запись ленты",
+                "verbose_name_plural": "Записи ленты",
+                "ordering": ["-created"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-created"], name="timeline_user_created_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="unique_timeline_entry"
+            ),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
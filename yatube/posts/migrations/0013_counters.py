@@ -0,0 +1,114 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_by(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=models.IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Comment = apps.get_model("posts", "Comment")
+    Follow = apps.get_model("posts", "Follow")
+    Group = apps.get_model("posts", "Group")
+    Post = apps.get_model("posts", "Post")
+    UserCounters = apps.get_model("posts", "UserCounters")
+
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(user_id=pk)
+            for pk in User.objects.values_list("pk", flat=True)
+        ]
+    )
+    UserCounters.objects.update(
+        posts_count=count_by(Post.objects.all(), "author"),
+        followers_count=count_by(Follow.objects.all(), "author"),
+        following_count=count_by(Follow.objects.all(), "user"),
+    )
+    Group.objects.update(posts_count=count_by(Post.objects.all(), "group"))
+    Post.objects.update(comments_count=count_by(Comment.objects.all(), "post"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0011_update_proxy_permissions"),
+        ("posts", "0012_timelineentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserCounters",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="counters",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+                (
+                    "posts_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество постов"
+                    ),
+                ),
+                (
+                    "followers_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество подписчиков"
+                    ),
+                ),
+                (
+                    "following_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество подписок"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Счётчики пользователя",
+                "verbose_name_plural": "Счётчики пользователей",
+            },
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="posts_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Количество постов сообщества: автоматическое поле",
+                verbose_name="Количество постов",
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Количество комментариев к посту: автоматическое поле",
+                verbose_name="Количество комментариев",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
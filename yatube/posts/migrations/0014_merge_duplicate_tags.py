@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    Tag = apps.get_model("posts", "Tag")
+    TagPost = apps.get_model("posts", "TagPost")
+
+    duplicated = (
+        Tag.objects.values("name")
+        .annotate(keep=Min("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+    )
+    for row in duplicated:
+        duplicates = Tag.objects.filter(name=row["name"]).exclude(
+            pk=row["keep"]
+        )
+        # A post keeps one link to the name, the kept tag's if it has one.
+        tagged = set(
+            TagPost.objects.filter(tag_id=row["keep"]).values_list(
+                "post_id", flat=True
+            )
+        )
+        moved = []
+        for pk, post_id in (
+            TagPost.objects.filter(tag__in=duplicates)
+            .order_by("pk")
+            .values_list("pk", "post_id")
+        ):
+            if post_id not in tagged:
+                tagged.add(post_id)
+                moved.append(pk)
+        TagPost.objects.filter(pk__in=moved).update(tag_id=row["keep"])
+        # The other links go with their tags.
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0013_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0014_merge_duplicate_tags"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tag",
+            name="name",
+            field=models.CharField(
+                help_text="Введите хештег",
+                max_length=32,
+                unique=True,
+                verbose_name="Хештег",
+            ),
+        ),
+    ]
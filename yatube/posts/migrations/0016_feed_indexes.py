@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0015_tag_name_unique"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="timelineentry",
+            name="timeline_user_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "-created"], name="comment_post_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["user", "author"], name="follow_user_author_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["-created", "-id"], name="post_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["author", "-created", "-id"],
+                name="post_author_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["group", "-created", "-id"],
+                name="post_group_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-created", "-post"],
+                name="timeline_user_created_idx",
+            ),
+        ),
+    ]
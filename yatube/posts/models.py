@@ -4,7 +4,57 @@ from django.db import models
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersMixin:
+    """Keeps full saves of a loaded row off its denormalized counters.
+
+    ``posts.counters`` shifts them with ``UPDATE ... SET x = x + 1``, so
+    the values loaded with the instance may be stale by the time an edit
+    form or serializer saves it. Otherwise ``save()`` works as usual: a
+    missing row is inserted, and an instance loaded with ``only()`` or
+    ``defer()`` saves just its loaded fields.
+    """
+
+    counter_fields = ()
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        deferred = self.get_deferred_fields()
+        if update_fields is None and deferred and not force_insert:
+            # As Model.save() does for deferred instances, minus the counters.
+            update_fields = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
+
+    def _do_update(
+        self, base_qs, using, pk_val, values, update_fields, forced_update
+    ):
+        if update_fields is None:
+            values = [
+                value
+                for value in values
+                if value[0].name not in self.counter_fields
+            ]
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+
+
+class Group(CountersMixin, models.Model):
     title = models.CharField(
         verbose_name="Название сообщества",
         help_text="Введите название сообщества",
@@ -18,6 +68,14 @@ class Group(models.Model):
         verbose_name="Описание сообщества",
         help_text="Введите описание сообщества",
     )
+    posts_count = models.PositiveIntegerField(
+        verbose_name="Количество постов",
+        default=0,
+        editable=False,
+        help_text="Количество постов сообщества: автоматическое поле",
+    )
+
+    counter_fields = ("posts_count",)
 
     def __str__(self):
         return self.title
@@ -28,6 +86,7 @@ class Tag(models.Model):
         verbose_name="Хештег",
         help_text="Введите хештег",
         max_length=32,
+        unique=True,
     )
 
     def __str__(self):
@@ -38,7 +97,7 @@ class Tag(models.Model):
         verbose_name_plural = "Хештеги"
 
 
-class Post(models.Model):
+class Post(CountersMixin, models.Model):
     text = models.TextField(
         verbose_name="Текст сообщения",
         help_text="Введите текст сообщения",
@@ -76,11 +135,31 @@ class Post(models.Model):
         verbose_name="Хештег",
         help_text="Введите хештег",
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name="Количество комментариев",
+        default=0,
+        editable=False,
+        help_text="Количество комментариев к посту: автоматическое поле",
+    )
+
+    counter_fields = ("comments_count",)
 
     class Meta:
         ordering = ["-created"]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        # Feeds are ordered by (-created, -id), see core.paginators.
+        indexes = [
+            models.Index(fields=["-created", "-id"], name="post_created_idx"),
+            models.Index(
+                fields=["author", "-created", "-id"],
+                name="post_author_created_idx",
+            ),
+            models.Index(
+                fields=["group", "-created", "-id"],
+                name="post_group_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -115,6 +194,11 @@ class Comment(models.Model):
         ordering = ["-created"]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=["post", "-created"], name="comment_post_created_idx"
+            )
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -145,6 +229,12 @@ class Follow(models.Model):
                 fields=["author", "user"], name="unique_following"
             )
         ]
+        # The unique constraint serves lookups by author.
+        indexes = [
+            models.Index(
+                fields=["user", "author"], name="follow_user_author_idx"
+            )
+        ]
 
     def __str__(self):
         return f"{self.author} followed by {self.user}"
@@ -164,3 +254,72 @@ class TagPost(models.Model):
 
     def __str__(self):
         return f"{self.tag} {self.post}"
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name="Подписчик",
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        help_text="Владелец ленты: автоматическое поле",
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name="Пост",
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        help_text="Пост в ленте подписчика: автоматическое поле",
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата и время публикации",
+        help_text="Копия даты публикации поста для сортировки ленты",
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created", "-post"],
+                name="timeline_user_created_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.post} in timeline of {self.user}"
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters",
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name="Количество постов",
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков",
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name="Количество подписок",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+    def __str__(self):
+        return f"Counters of {self.user}"
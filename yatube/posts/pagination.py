@@ -0,0 +1,17 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class PostCursorPagination(CursorPagination):
+    """Cursor pagination for post listings of the REST API.
+
+    Page size is taken from ``REST_FRAMEWORK["PAGE_SIZE"]`` and may be
+    changed by a client with ``?page_size=`` up to ``API_MAX_PAGE_SIZE``.
+    """
+
+    ordering = ("-created", "-id")
+    page_size_query_param = "page_size"
+
+    @property
+    def max_page_size(self) -> int:
+        return settings.API_MAX_PAGE_SIZE
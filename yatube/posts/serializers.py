@@ -1,3 +1,5 @@
+from core import images
+from django.db import transaction
 from rest_framework.serializers import (
     DateTimeField,
     ModelSerializer,
@@ -5,13 +7,35 @@ from rest_framework.serializers import (
     SlugRelatedField,
 )
 
-from .models import Group, Post, Tag, TagPost
+from .models import Group, Post, Tag
+from .tags import resolve, tag_post
+
+
+class EagerLoadingMixin:
+    """Declares the relations a serializer reads from every instance.
+
+    Views build their querysets with ``setup_eager_loading`` so that a
+    page of objects is serialized with a fixed number of queries.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
 
 
 class TagSerializer(ModelSerializer):
     class Meta:
         model = Tag
         fields = ("name",)
+        # Posts refer to existing tags by name as well.
+        extra_kwargs = {"name": {"validators": []}}
 
 
 class GroupSerializer(ModelSerializer):
@@ -20,7 +44,10 @@ class GroupSerializer(ModelSerializer):
         fields = ("id", "title", "slug", "description")
 
 
-class PostSerializer(ModelSerializer):
+class PostSerializer(EagerLoadingMixin, ModelSerializer):
+    select_related_fields = ("group",)
+    prefetch_related_fields = ("tag",)
+
     publication_date = DateTimeField(source="created", read_only=True)
     tag = TagSerializer(many=True, required=False, allow_null=True)
     group = SlugRelatedField(
@@ -43,27 +70,30 @@ class PostSerializer(ModelSerializer):
             "tag",
             "character_quantity",
         )
+        extra_kwargs = {
+            "image": {
+                "validators": [images.validate_upload],
+                "error_messages": {
+                    "invalid_image": images.INVALID_IMAGE_MESSAGE
+                },
+            }
+        }
 
-    def create(self, validated_data):
-        if "tag" not in self.initial_data:
-            post = Post.objects.create(**validated_data)
-            return post
-
-        tags = validated_data.pop("tag")
+    def validate_image(self, value):
+        return images.normalize(value) if value else value
 
+    @transaction.atomic
+    def create(self, validated_data):
+        tags = validated_data.pop("tag", None) or []
         post = Post.objects.create(**validated_data)
-
-        for tag in tags:
-            current_tag, status = Tag.objects.get_or_create(**tag)
-            TagPost.objects.create(tag=current_tag, post=post)
+        tag_post(post, resolve(tag["name"] for tag in tags), created=True)
         return post
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        if "tag" in self.initial_data:
+        if "tag" in validated_data:
             tags = validated_data.pop("tag") or []
-            instance.tag.set(
-                [Tag.objects.get_or_create(**tag)[0] for tag in tags]
-            )
+            tag_post(instance, resolve(tag["name"] for tag in tags))
         return super().update(instance, validated_data)
 
     def get_character_quantity(self, obj):
@@ -0,0 +1,107 @@
+from core import caching, thumbnails
+from core.tasks import defer
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch ``last_login``, which profiles don't show.
+    if update_fields != frozenset(["last_login"]):
+        caching.bump("users")
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    previous = (
+        Post.objects.filter(pk=instance.pk)
+        .values("author_id", "group_id", "image")
+        .first()
+        if instance.pk
+        else None
+    ) or {}
+    instance._previous_author_id = previous.get("author_id")
+    instance._previous_group_id = previous.get("group_id")
+    instance._previous_image = previous.get("image")
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    caching.bump("posts")
+    previous_author_id = getattr(instance, "_previous_author_id", None)
+    previous_group_id = getattr(instance, "_previous_group_id", None)
+    if created:
+        counters.shift_user(instance.author_id, "posts_count", 1)
+        defer(timeline.fan_out, instance.pk)
+    elif previous_author_id and previous_author_id != instance.author_id:
+        counters.shift_user(previous_author_id, "posts_count", -1)
+        counters.shift_user(instance.author_id, "posts_count", 1)
+        defer(timeline.reassign, instance.pk)
+
+    if previous_group_id and previous_group_id != instance.group_id:
+        counters.shift_group(previous_group_id, -1)
+
+    if instance.group_id and (
+        created or previous_group_id != instance.group_id
+    ):
+        counters.shift_group(instance.group_id, 1)
+
+    previous_image = getattr(instance, "_previous_image", None)
+    if previous_image and previous_image != instance.image.name:
+        thumbnails.forget(previous_image)
+    if instance.image:
+        thumbnails.queue(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    caching.bump("posts")
+    counters.shift_user(instance.author_id, "posts_count", -1)
+    if instance.group_id:
+        counters.shift_group(instance.group_id, -1)
+    if instance.image:
+        thumbnails.forget(instance.image.name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump("posts", "groups")
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    caching.bump(f"comments:{instance.post_id}")
+    if created:
+        counters.shift_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    caching.bump(f"comments:{instance.post_id}")
+    counters.shift_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_user(instance.author_id, "followers_count", 1)
+        counters.shift_user(instance.user_id, "following_count", 1)
+        defer(timeline.backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.shift_user(instance.author_id, "followers_count", -1)
+    counters.shift_user(instance.user_id, "following_count", -1)
+    defer(timeline.prune, instance.user_id, instance.author_id)
@@ -0,0 +1,44 @@
+"""Hashtags resolved in bulk.
+
+Posts are tagged with a constant number of statements whatever the number
+of tags: existing tags are fetched with one query, the missing ones are
+inserted with one ``INSERT`` that skips names created concurrently (the
+unique index on ``Tag.name`` arbitrates) and read back with another.
+"""
+from typing import Iterable, List
+
+from django.db import transaction
+
+from .models import Post, Tag, TagPost
+
+
+def resolve(names: Iterable[str]) -> List[Tag]:
+    """Tags named *names* in the given order, created if missing."""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True
+        )
+        tags.update(
+            (tag.name, tag) for tag in Tag.objects.filter(name__in=missing)
+        )
+    return [tags[name] for name in names]
+
+
+@transaction.atomic
+def tag_post(post: Post, tags: List[Tag], created: bool = False) -> None:
+    """Make *tags* the tags of *post*.
+
+    A *created* post has no tags yet, so its rows are just inserted.
+    """
+    if created:
+        TagPost.objects.bulk_create(
+            [TagPost(tag=tag, post=post) for tag in tags]
+        )
+    else:
+        post.tag.set(tags)
@@ -0,0 +1,178 @@
+from core.queries import assert_query_budget, counted
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIClient
+
+from ..models import Group, Post, Tag, User
+from ..serializers import PostSerializer
+
+
+class PostAPIListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f"Пост №{num}")
+            for num in range(5)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("posts:api_posts-list")
+
+    def test_list_is_paginated(self):
+        """Список постов отдаётся страницами со ссылками next/previous"""
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]],
+            [post.id for post in PostAPIListTest.posts[::-1][:2]],
+        )
+        self.assertIsNone(response.data["previous"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]],
+            [post.id for post in PostAPIListTest.posts[::-1][2:4]],
+        )
+        self.assertIsNotNone(response.data["previous"])
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_limited(self):
+        """Размер страницы не превышает API_MAX_PAGE_SIZE"""
+        response = self.client.get(self.url, {"page_size": 1000})
+        self.assertEqual(len(response.data["results"]), 3)
+
+
+class PostAPIQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.tags = [Tag.objects.create(name=f"тег{num}") for num in range(3)]
+        for num in range(30):
+            group = Group.objects.create(
+                title=f"Группа №{num}", slug=f"group-{num}"
+            )
+            post = Post.objects.create(
+                author=cls.user, text=f"Пост №{num}", group=group
+            )
+            post.tag.set(cls.tags[: num % 4])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        Group.objects.all().delete()
+        Tag.objects.all().delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_query_count_is_fixed(self):
+        """Число запросов списка постов не зависит от размера страницы"""
+        url = reverse("posts:api_posts-list")
+        for page_size in (1, 10, 30):
+            with self.subTest(page_size=page_size):
+                # Страница постов и теги всех постов страницы
+                with assert_query_budget(2):
+                    response = self.client.get(url, {"page_size": page_size})
+                self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_detail_query_count(self):
+        """Пост отдаётся с группой и тегами за два запроса"""
+        post = Post.objects.filter(tag__isnull=False).first()
+        url = reverse("posts:api_posts-detail", kwargs={"pk": post.pk})
+        with assert_query_budget(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data["group"], post.group.slug)
+        self.assertTrue(response.data["tag"])
+
+    def test_relations_are_eager_loaded(self):
+        """Все связи сериализатора объявлены для жадной загрузки"""
+        declared = {
+            *PostSerializer.select_related_fields,
+            *PostSerializer.prefetch_related_fields,
+        }
+        for name, field in PostSerializer().fields.items():
+            if isinstance(field, (ListSerializer, ManyRelatedField)) or (
+                isinstance(field, RelatedField)
+                and not field.use_pk_only_optimization()
+            ):
+                with self.subTest(field=name):
+                    self.assertIn(field.source, declared)
+
+
+class PostAPITagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.tag = Tag.objects.create(name="старый")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        Tag.objects.all().delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("posts:api_posts-list")
+
+    def create_post(self, names):
+        return self.client.post(
+            self.url,
+            {
+                "text": "Пост с тегами",
+                "author": self.user.pk,
+                "tag": [{"name": name} for name in names],
+            },
+            format="json",
+        )
+
+    def test_create_reuses_tags(self):
+        """Существующие теги не дублируются, новые создаются"""
+        response = self.create_post(["старый", "новый", "новый"])
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertEqual(
+            sorted(post.tag.values_list("name", flat=True)),
+            ["новый", "старый"],
+        )
+        self.assertEqual(Tag.objects.filter(name="старый").count(), 1)
+
+    def test_create_query_count_is_fixed(self):
+        """Число запросов создания поста не зависит от числа тегов"""
+        queries = {}
+        for count in (1, 20):
+            names = [f"тег{count}-{num}" for num in range(count)]
+            with CaptureQueriesContext(connection) as captured:
+                response = self.create_post(names)
+            self.assertEqual(len(response.data["tag"]), count)
+            queries[count] = len(counted(captured.captured_queries))
+        self.assertEqual(queries[1], queries[20])
+
+    def test_update_replaces_tags(self):
+        """Обновление заменяет набор тегов поста"""
+        post_id = self.create_post(["старый", "первый"]).data["id"]
+        url = reverse("posts:api_posts-detail", kwargs={"pk": post_id})
+        response = self.client.patch(
+            url, {"tag": [{"name": "старый"}, {"name": "второй"}]}, "json"
+        )
+        self.assertEqual(
+            sorted(tag["name"] for tag in response.data["tag"]),
+            ["второй", "старый"],
+        )
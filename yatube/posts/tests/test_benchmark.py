@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from ..management.commands.benchmark import compare
+from ..models import Comment, Follow, Group, Post, User
+
+
+class BenchmarkCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            text="Тестовый пост", author=cls.author, group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.user, text="Да")
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        cls.author.delete()
+        cls.group.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, "benchmark.json")
+
+    def benchmark(self, **options):
+        call_command(
+            "benchmark",
+            current_db=True,
+            requests=3,
+            warmup=0,
+            output=self.output,
+            stdout=StringIO(),
+            **options,
+        )
+        with open(self.output) as file:
+            return json.load(file)
+
+    def test_results(self):
+        """Команда измеряет все страницы и пишет результаты в JSON"""
+        report = self.benchmark()
+        results = report["results"]["current"]
+        self.assertEqual(
+            set(results),
+            {
+                "index",
+                "group_posts",
+                "profile",
+                "post_detail",
+                "follow_index",
+                "api_posts",
+                "api_post",
+            },
+        )
+        for view, metrics in results.items():
+            with self.subTest(view=view):
+                self.assertLessEqual(metrics["p50_ms"], metrics["p95_ms"])
+                self.assertLessEqual(metrics["p95_ms"], metrics["p99_ms"])
+                self.assertGreater(metrics["queries"], 0)
+                self.assertGreater(metrics["bytes"], 0)
+        self.assertIn(
+            "Тестовый пост".encode(),
+            self.client.get(results["post_detail"]["url"]).content,
+        )
+
+    def test_private_cache(self):
+        """Замеры не трогают кеш, метрики и журнал запросов сайта"""
+        metrics_dir = os.path.join(os.path.dirname(self.output), "metrics")
+        slow_log = os.path.join(os.path.dirname(self.output), "slow.log")
+        cache.clear()
+        cache.set("site", "value")
+        with override_settings(
+            METRICS_DIR=metrics_dir,
+            SLOW_QUERY_LOG=slow_log,
+            SLOW_QUERY_MS=1e-6,
+        ):
+            self.benchmark()
+        self.assertEqual(cache.get("site"), "value")
+        self.assertEqual(len(caches["shared"]._cache), 1)
+        self.assertFalse(os.path.exists(metrics_dir))
+        self.assertFalse(os.path.exists(slow_log))
+
+    @override_settings(DATABASE_REPLICAS=["replica1"])
+    def test_reads_primary(self):
+        """Замеры не читают с реплик рабочей базы"""
+        results = self.benchmark()["results"]["current"]
+        self.assertGreater(results["follow_index"]["bytes"], 0)
+        self.assertGreater(results["api_posts"]["queries"], 0)
+
+    def test_baseline_regressions(self):
+        """Рост числа запросов относительно эталона считается регрессией"""
+        report = self.benchmark()
+        report["results"]["current"]["index"]["queries"] -= 1
+        baseline = os.path.join(os.path.dirname(self.output), "base.json")
+        with open(baseline, "w") as file:
+            json.dump(report, file)
+        with self.assertRaisesMessage(CommandError, "current index: queries"):
+            self.benchmark(baseline=baseline, tolerance=100)
+
+
+class CompareTest(TestCase):
+    BEFORE = {
+        "p50_ms": 10.0,
+        "p95_ms": 20.0,
+        "p99_ms": 30.0,
+        "queries": 3,
+        "sql_ms": 1.0,
+        "bytes": 1000,
+    }
+
+    def regressions(self, **changes):
+        return compare(
+            {"small": {"index": {**self.BEFORE, **changes}}},
+            {"small": {"index": self.BEFORE}},
+            tolerance=0.5,
+        )
+
+    def test_within_tolerance(self):
+        """Колебания в пределах допуска не считаются регрессией"""
+        self.assertEqual(
+            self.regressions(p50_ms=14.9, sql_ms=2.9, p99_ms=100, bytes=1499),
+            [],
+        )
+        self.assertEqual(self.regressions(queries=2), [])
+
+    def test_regressions(self):
+        """Каждая ухудшившаяся метрика попадает в отчёт"""
+        self.assertEqual(
+            self.regressions(p95_ms=31, queries=4, bytes=1501),
+            [
+                "small index: queries 3 -> 4",
+                "small index: p95_ms 20.0 -> 31.0",
+                "small index: bytes 1000 -> 1501",
+            ],
+        )
+
+    def test_new_views_are_skipped(self):
+        """Страницы без эталона не сравниваются"""
+        self.assertEqual(
+            compare({"large": {"index": self.BEFORE}}, {"small": {}}), []
+        )
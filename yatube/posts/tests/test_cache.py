@@ -1,8 +1,13 @@
+import time
+from unittest import mock
+
+from core.queries import assert_query_budget
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 
-from ..models import Post, User
+from ..models import Comment, Follow, Group, Post, User
 
 
 class PostCacheTest(TestCase):
@@ -11,13 +16,16 @@ class PostCacheTest(TestCase):
         super().setUpClass()
 
         cls.user = User.objects.create_user(username="test_user")
+        cls.author = User.objects.create_user(username="author")
 
     @classmethod
     def tearDownClass(cls):
         cls.user.delete()
+        cls.author.delete()
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_index_cache(self):
@@ -26,15 +34,15 @@ class PostCacheTest(TestCase):
             author=PostCacheTest.user,
         )
 
-        # Проверяем, что объект остался в кеше страницы после его
-        # удаления из базы данных
-        response_before_delete = self.guest_client.get(reverse("posts:index"))
-        Post.objects.filter(pk=post.pk).delete()
-        response_after_delete = self.guest_client.get(reverse("posts:index"))
+        # Проверяем, что страница берётся из кеша, пока посты не менялись:
+        # update() не вызывает сигналов и не сбрасывает кеш
+        response_before_update = self.guest_client.get(reverse("posts:index"))
+        Post.objects.filter(pk=post.pk).update(text="Изменённый пост")
+        response_after_update = self.guest_client.get(reverse("posts:index"))
         with self.subTest("Кеш не работает!"):
             self.assertEqual(
-                response_before_delete.content,
-                response_after_delete.content,
+                response_before_update.content,
+                response_after_update.content,
             )
 
         # Проверяем, что страница изменилась после очистки кеша
@@ -42,6 +50,203 @@ class PostCacheTest(TestCase):
         response_after_clear = self.guest_client.get(reverse("posts:index"))
         with self.subTest("Очистка кеша не работает!"):
             self.assertNotEqual(
-                response_before_delete.content,
+                response_before_update.content,
                 response_after_clear.content,
             )
+
+    def test_index_cache_invalidation(self):
+        """Удаление поста сразу сбрасывает кеш ленты"""
+        post = Post.objects.create(
+            text="Тестовый пост",
+            author=PostCacheTest.user,
+        )
+        response_before_delete = self.guest_client.get(reverse("posts:index"))
+        post.delete()
+        response_after_delete = self.guest_client.get(reverse("posts:index"))
+        self.assertIn(post.text.encode(), response_before_delete.content)
+        self.assertNotIn(post.text.encode(), response_after_delete.content)
+
+    def test_cache_key_varies_on_cursor(self):
+        """Страницы ленты кешируются под разными ключами"""
+        for num in range(11):
+            Post.objects.create(text=f"Пост №{num}", author=PostCacheTest.user)
+
+        first_page = self.guest_client.get(reverse("posts:index"))
+        next_cursor = first_page.context["page_obj"].object_list.next_cursor
+        second_page = self.guest_client.get(
+            reverse("posts:index"), {"cursor": next_cursor}
+        )
+        self.assertNotEqual(
+            first_page.context["cache_key"], second_page.context["cache_key"]
+        )
+        self.assertIn("Пост №0".encode(), second_page.content)
+
+    def test_follow_cache_varies_on_viewer(self):
+        """Лента подписок одного пользователя не достаётся другому"""
+        Follow.objects.create(author=PostCacheTest.author, user=self.user)
+        Post.objects.create(text="Пост автора", author=PostCacheTest.author)
+        follower_client = Client()
+        follower_client.force_login(PostCacheTest.user)
+        another_client = Client()
+        another_client.force_login(PostCacheTest.author)
+
+        follower_page = follower_client.get(reverse("posts:follow_index"))
+        another_page = another_client.get(reverse("posts:follow_index"))
+
+        self.assertIn("Пост автора".encode(), follower_page.content)
+        self.assertNotIn("Пост автора".encode(), another_page.content)
+
+    def test_group_lookup_invalidation(self):
+        """Изменение группы сразу видно на её странице"""
+        group = Group.objects.create(
+            title="Старое название", slug="test-slug", description="Описание"
+        )
+        url = reverse("posts:group_list", kwargs={"slug": group.slug})
+        self.guest_client.get(url)
+        group.title = "Новое название"
+        group.save()
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context["group"].title, "Новое название")
+
+    def test_author_name_invalidation(self):
+        """Новое имя автора сразу видно во всех лентах"""
+        group = Group.objects.create(
+            title="Группа", slug="test-slug", description="Описание"
+        )
+        Post.objects.create(
+            text="Тестовый пост", author=PostCacheTest.author, group=group
+        )
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": group.slug}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        PostCacheTest.author.first_name = "Новое имя"
+        PostCacheTest.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), "Новое имя")
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.post = Post.objects.create(text="Тестовый пост", author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_not_modified(self):
+        """Неизменившиеся страницы отдаются с кодом 304 без запросов"""
+        urls = (
+            reverse("posts:index"),
+            reverse("posts:profile", kwargs={"username": self.user}),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn("Cookie", response["Vary"])
+                with assert_query_budget(0):
+                    not_modified = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response["ETag"]
+                    )
+                    cached = self.guest_client.get(url)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(cached.content, response.content)
+
+                # Last-Modified appears once the second of the write is over.
+                with mock.patch("time.time", return_value=time.time() + 1):
+                    last_modified = self.guest_client.get(url)["Last-Modified"]
+                    not_modified = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=last_modified
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_etag_varies_on_path(self):
+        """Страницы с одними зависимостями получают разные ETag"""
+        for num in range(11):
+            Post.objects.create(text=f"Пост №{num}", author=self.user)
+        first_page = self.guest_client.get(reverse("posts:index"))
+        next_cursor = first_page.context["page_obj"].object_list.next_cursor
+        second_page = self.guest_client.get(
+            reverse("posts:index"), {"cursor": next_cursor}
+        )
+        profile = self.guest_client.get(
+            reverse("posts:profile", kwargs={"username": self.user})
+        )
+        self.assertEqual(
+            len({first_page["ETag"], second_page["ETag"], profile["ETag"]}), 3
+        )
+
+        response = self.guest_client.get(
+            reverse("posts:index"),
+            {"cursor": next_cursor},
+            HTTP_IF_NONE_MATCH=first_page["ETag"],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Пост №0".encode(), response.content)
+
+    def test_write_within_second(self):
+        """Запись в ту же секунду не даёт ответа 304 по Last-Modified"""
+        url = reverse("posts:post_detail", kwargs={"post_id": self.post.pk})
+        written_at = 1_000_000.25
+        with mock.patch("time.time", return_value=written_at):
+            Comment.objects.create(
+                post=self.post, author=self.user, text="Первый"
+            )
+            # Another write may still share this second.
+            self.assertNotIn("Last-Modified", self.guest_client.get(url))
+        with mock.patch("time.time", return_value=written_at + 0.5):
+            Comment.objects.create(
+                post=self.post, author=self.user, text="Второй"
+            )
+        with mock.patch("time.time", return_value=written_at + 1):
+            response = self.guest_client.get(url)
+            self.assertEqual(
+                response["Last-Modified"], http_date(1_000_001)
+            )
+            not_modified = self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_modified_by_comment(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        url = reverse("posts:post_detail", kwargs={"post_id": self.post.pk})
+        etag = self.guest_client.get(url)["ETag"]
+        Comment.objects.create(
+            post=self.post, author=self.user, text="Комментарий"
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Комментарий".encode(), response.content)
+
+    def test_modified_by_release(self):
+        """Новый релиз меняет ETag и содержимое закешированных страниц"""
+        url = reverse("posts:index")
+        with override_settings(CACHE_VERSION="old"):
+            etag = self.guest_client.get(url)["ETag"]
+        with override_settings(CACHE_VERSION="new"):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_authenticated_not_cached(self):
+        """Авторизованным пользователям страницы не кешируются целиком"""
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(reverse("posts:index"))
+        self.assertNotIn("ETag", response)
+        self.assertIn("Cookie", response["Vary"])
@@ -0,0 +1,302 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..counters import get_counters
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username="author")
+        cls.follower = User.objects.create_user(username="follower")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.another_group = Group.objects.create(
+            title="Ещё одна тестовая группа",
+            slug="another-test-slug",
+            description="Тестовое описание",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.author.delete()
+        cls.follower.delete()
+        cls.group.delete()
+        cls.another_group.delete()
+        super().tearDownClass()
+
+    def refreshed_counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами"""
+        post = Post.objects.create(
+            author=CountersTest.author,
+            text="Тестовый пост",
+            group=CountersTest.group,
+        )
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).posts_count, 1
+        )
+        CountersTest.group.refresh_from_db()
+        self.assertEqual(CountersTest.group.posts_count, 1)
+
+        post.group = CountersTest.another_group
+        post.save()
+        CountersTest.group.refresh_from_db()
+        CountersTest.another_group.refresh_from_db()
+        self.assertEqual(CountersTest.group.posts_count, 0)
+        self.assertEqual(CountersTest.another_group.posts_count, 1)
+
+        post.delete()
+        CountersTest.another_group.refresh_from_db()
+        self.assertEqual(CountersTest.another_group.posts_count, 0)
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).posts_count, 0
+        )
+
+    def test_author_change_moves_post_counter(self):
+        """Смена автора поста переносит его в счётчик нового автора"""
+        post = Post.objects.create(
+            author=CountersTest.author, text="Тестовый пост"
+        )
+
+        post.author = CountersTest.follower
+        post.save()
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).posts_count, 0
+        )
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.follower).posts_count, 1
+        )
+        post.delete()
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следует за комментариями"""
+        post = Post.objects.create(
+            author=CountersTest.author, text="Тестовый пост"
+        )
+        comment = Comment.objects.create(
+            author=CountersTest.follower, post=post, text="Комментарий"
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок следуют за подписками"""
+        follow = Follow.objects.create(
+            author=CountersTest.author, user=CountersTest.follower
+        )
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).followers_count, 1
+        )
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.follower).following_count, 1
+        )
+
+        follow.delete()
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).followers_count, 0
+        )
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.follower).following_count, 0
+        )
+
+    def test_missing_counters_are_created(self):
+        """Отсутствующие счётчики пользователя вычисляются при чтении"""
+        Post.objects.create(author=CountersTest.author, text="Тестовый пост")
+        UserCounters.objects.filter(user=CountersTest.author).delete()
+        author = User.objects.get(pk=CountersTest.author.pk)
+        self.assertEqual(get_counters(author).posts_count, 1)
+
+    def test_recount_command(self):
+        """Команда recount исправляет разошедшиеся счётчики"""
+        Post.objects.bulk_create(
+            [
+                Post(
+                    author=CountersTest.author,
+                    group=CountersTest.group,
+                    text=f"Пост №{num}",
+                )
+                for num in range(3)
+            ]
+        )
+        UserCounters.objects.filter(user=CountersTest.follower).delete()
+
+        call_command("recount", stdout=StringIO())
+
+        self.assertEqual(
+            self.refreshed_counters(CountersTest.author).posts_count, 3
+        )
+        self.assertTrue(
+            UserCounters.objects.filter(user=CountersTest.follower).exists()
+        )
+        CountersTest.group.refresh_from_db()
+        self.assertEqual(CountersTest.group.posts_count, 3)
+
+
+class EditKeepsCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_superuser(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.author.delete()
+        cls.group.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            author=EditKeepsCountersTest.author,
+            text="Тестовый пост",
+            group=EditKeepsCountersTest.group,
+        )
+        Comment.objects.create(
+            author=EditKeepsCountersTest.author,
+            post=self.post,
+            text="Комментарий",
+        )
+
+    def assert_counters_kept(self, edit, table, column):
+        """Run *edit*, which must not write *column* of *table*."""
+        with CaptureQueriesContext(connection) as captured:
+            response = edit()
+        self.assertLess(response.status_code, 400)
+        for query in captured.captured_queries:
+            if query["sql"].startswith(f'UPDATE "{table}"'):
+                self.assertNotIn(column, query["sql"])
+
+        self.post.refresh_from_db()
+        EditKeepsCountersTest.group.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(EditKeepsCountersTest.group.posts_count, 1)
+
+    def test_post_edit_view(self):
+        """Редактирование поста не перезаписывает счётчик комментариев"""
+        self.client.force_login(EditKeepsCountersTest.author)
+        self.assert_counters_kept(
+            lambda: self.client.post(
+                reverse("posts:post_edit", args=(self.post.pk,)),
+                {
+                    "text": "Изменённый пост",
+                    "group": EditKeepsCountersTest.group.pk,
+                },
+            ),
+            "posts_post",
+            "comments_count",
+        )
+
+    def test_post_api_update(self):
+        """Изменение поста через API не перезаписывает счётчик комментариев"""
+        self.assert_counters_kept(
+            lambda: APIClient().patch(
+                reverse("posts:api_posts-detail", kwargs={"pk": self.post.pk}),
+                {"text": "Изменённый пост"},
+                "json",
+            ),
+            "posts_post",
+            "comments_count",
+        )
+
+    def test_group_admin_edit(self):
+        """Редактирование группы в админке не перезаписывает счётчик постов"""
+        group = EditKeepsCountersTest.group
+        self.client.force_login(EditKeepsCountersTest.author)
+        self.assert_counters_kept(
+            lambda: self.client.post(
+                reverse("admin:posts_group_change", args=(group.pk,)),
+                {
+                    "title": "Новое название",
+                    "slug": group.slug,
+                    "description": group.description,
+                },
+            ),
+            "posts_group",
+            "posts_count",
+        )
+
+    def test_stale_instance_keeps_counters(self):
+        """Сохранение устаревшего экземпляра не откатывает счётчики"""
+        post = Post.objects.get(pk=self.post.pk)
+        group = Group.objects.get(pk=EditKeepsCountersTest.group.pk)
+        Comment.objects.create(
+            author=EditKeepsCountersTest.author, post=post, text="Ещё один"
+        )
+        Post.objects.create(
+            author=EditKeepsCountersTest.author, text="Ещё пост", group=group
+        )
+
+        post.text = "Изменённый пост"
+        post.save()
+        group.title = "Новое название"
+        group.save()
+
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, "Изменённый пост")
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(group.posts_count, 2)
+
+    def test_deleted_instance_is_inserted(self):
+        """Сохранение удалённого поста вставляет его заново"""
+        post = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=post.pk).delete()
+
+        post.save()
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+
+    def test_deferred_fields_not_written(self):
+        """Сохранение поста, загруженного частично, пишет только его поля"""
+        for queryset in (
+            Post.objects.only("text"),
+            Post.objects.defer("author", "group", "image"),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                post = queryset.get(pk=self.post.pk)
+                post.text = "Изменённый пост"
+                Post.objects.filter(pk=post.pk).update(
+                    group=None, comments_count=2
+                )
+                with CaptureQueriesContext(connection) as captured:
+                    post.save()
+                (query,) = [
+                    query["sql"]
+                    for query in captured.captured_queries
+                    if query["sql"].startswith('UPDATE "posts_post"')
+                ]
+                self.assertIn('"text"', query)
+                self.assertNotIn('"group_id"', query)
+                self.assertNotIn('"comments_count"', query)
+
+                post = Post.objects.get(pk=post.pk)
+                self.assertEqual(post.text, "Изменённый пост")
+                self.assertEqual(post.comments_count, 2)
+                Post.objects.filter(pk=post.pk).update(
+                    group=EditKeepsCountersTest.group, comments_count=1
+                )
@@ -0,0 +1,87 @@
+from urllib.parse import parse_qs, urlparse
+
+from core.queries import counted, explain, unindexed_steps
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class FeedIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for num in range(15):
+            cls.post = Post.objects.create(
+                text=f"Пост №{num}", author=cls.author, group=cls.group
+            )
+        Comment.objects.create(post=cls.post, author=cls.user, text="Да")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        cls.author.delete()
+        cls.group.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed_queries(self, url, table, params=None):
+        """Упорядоченные выборки из *table*, выполненные страницей"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url, params)
+        return [
+            sql
+            for sql in counted(queries.captured_queries)
+            if f'FROM "{table}"' in sql and "ORDER BY" in sql
+        ]
+
+    def test_feeds_use_indexes(self):
+        """Ленты читаются по индексам, без полного просмотра и сортировки"""
+        feeds = {
+            reverse("posts:index"): "posts_post",
+            reverse(
+                "posts:group_list", kwargs={"slug": self.group.slug}
+            ): "posts_post",
+            reverse(
+                "posts:profile", kwargs={"username": self.author}
+            ): "posts_post",
+            reverse("posts:follow_index"): "posts_post",
+            reverse(
+                "posts:post_detail", kwargs={"post_id": self.post.pk}
+            ): "posts_comment",
+            reverse("posts:api_posts-list"): "posts_post",
+        }
+        for url, table in feeds.items():
+            pages = [{"page_size": 5}]
+            if table == "posts_post":
+                pages.append({"page_size": 5, **self.next_page(url)})
+            for params in pages:
+                with self.subTest(url=url, params=params):
+                    queries = self.feed_queries(url, table, params)
+                    self.assertTrue(queries)
+                    for sql in queries:
+                        plan = explain(sql)
+                        self.assertEqual(unindexed_steps(plan), [], plan)
+
+    def next_page(self, url):
+        response = self.authorized_client.get(url, {"page_size": 5})
+        if response.get("Content-Type") == "application/json":
+            query = urlparse(response.data["next"]).query
+            return {"cursor": parse_qs(query)["cursor"][0]}
+        return {"cursor": response.context["page_obj"].object_list.next_cursor}
@@ -0,0 +1,50 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateTagsTest(TransactionTestCase):
+    before = [("posts", "0013_counters")]
+    after = [("posts", "0014_merge_duplicate_tags")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_merge(self):
+        """Дубли хештега сливаются, у поста остаётся одна связь с ним"""
+        apps = self.migrate(self.before)
+        User = apps.get_model("auth", "User")
+        Post = apps.get_model("posts", "Post")
+        Tag = apps.get_model("posts", "Tag")
+        TagPost = apps.get_model("posts", "TagPost")
+
+        author = User.objects.create(username="author")
+        kept = Tag.objects.create(name="tag")
+        first = Tag.objects.create(name="tag")
+        second = Tag.objects.create(name="tag")
+        both = Post.objects.create(author=author, text="Два дубля")
+        with_kept = Post.objects.create(author=author, text="Дубль и тег")
+        for tag in (first, second):
+            TagPost.objects.create(tag=tag, post=both)
+        for tag in (kept, second):
+            TagPost.objects.create(tag=tag, post=with_kept)
+
+        apps = self.migrate(self.after)
+        Tag = apps.get_model("posts", "Tag")
+        TagPost = apps.get_model("posts", "TagPost")
+
+        self.assertEqual(
+            list(Tag.objects.values_list("pk", flat=True)), [kept.pk]
+        )
+        self.assertEqual(
+            sorted(TagPost.objects.values_list("tag_id", "post_id")),
+            [(kept.pk, both.pk), (kept.pk, with_kept.pk)],
+        )
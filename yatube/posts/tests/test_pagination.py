@@ -1,4 +1,12 @@
-from django.test import Client, TestCase
+import base64
+import json
+from urllib.parse import quote
+
+from core.paginators import CursorPaginator
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post, User
@@ -58,3 +66,114 @@ class PaginatorViewsTest(TestCase):
                     len(response.context["page_obj"]),
                     POSTS_PER_PAGE,
                 )
+
+    def test_cursor_navigation(self):
+        """Проверка переходов по курсорам без COUNT-запросов"""
+        url = reverse("posts:index")
+
+        with CaptureQueriesContext(connection) as queries:
+            first_page = (
+                self.authorized_client.get(url).context["page_obj"].object_list
+            )
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        )
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertIsNotNone(first_page.next_cursor)
+
+        second_page = (
+            self.authorized_client.get(url, {"cursor": first_page.next_cursor})
+            .context["page_obj"]
+            .object_list
+        )
+        self.assertEqual(
+            len(second_page), len(PaginatorViewsTest.posts) - POSTS_PER_PAGE
+        )
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(set(first_page) & set(second_page))
+
+        back_page = (
+            self.authorized_client.get(
+                url, {"cursor": second_page.previous_cursor}
+            )
+            .context["page_obj"]
+            .object_list
+        )
+        self.assertEqual(list(back_page), list(first_page))
+        self.assertIsNone(back_page.previous_cursor)
+
+    def test_cursor_page_api(self):
+        """Страница с курсором поддерживает API страниц Django"""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        first_page = paginator.get_page(None)
+        self.assertIsNone(first_page.number)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_other_pages())
+        with self.assertRaises(EmptyPage):
+            first_page.previous_page_number()
+
+        second_page = paginator.get_page(first_page.next_page_number())
+        self.assertEqual(second_page.number, first_page.next_page_number())
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        self.assertEqual(
+            list(paginator.get_page(second_page.previous_page_number())),
+            list(first_page),
+        )
+
+    def test_cursor_links_are_escaped(self):
+        """Курсоры в ссылках пагинатора экранируются"""
+        url = reverse("posts:index")
+        response = self.authorized_client.get(url)
+        next_cursor = response.context["page_obj"].next_page_number()
+        self.assertContains(response, f'href="?cursor={quote(next_cursor)}"')
+
+        response = self.authorized_client.get(url, {"cursor": next_cursor})
+        previous_cursor = response.context["page_obj"].previous_page_number()
+        self.assertContains(
+            response, f'href="?cursor={quote(previous_cursor)}"'
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse("posts:index"), {"cursor": "not-a-cursor"}
+        )
+        self.assertEqual(len(response.context["page_obj"]), POSTS_PER_PAGE)
+        self.assertIsNone(
+            response.context["page_obj"].object_list.previous_cursor
+        )
+
+    def test_forged_cursor_returns_first_page(self):
+        """Курсор с чужими значениями тоже открывает первую страницу"""
+        for payload in (
+            [False, ["notadate", 1]],
+            [False, [{}, []]],
+            [None, None],
+            [1, ["2021-01-01T00:00:00+00:00", 1]],
+            [False, [None, None]],
+            {"reverse": False, "values": []},
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode()
+            with self.subTest(payload=payload):
+                response = self.authorized_client.get(
+                    reverse("posts:index"), {"cursor": cursor}
+                )
+                self.assertEqual(
+                    len(response.context["page_obj"]), POSTS_PER_PAGE
+                )
+
+    @override_settings(FEED_PAGINATION="numbers")
+    def test_page_numbers_mode(self):
+        """Проверка постраничного режима с номерами страниц"""
+        response = self.authorized_client.get(
+            reverse("posts:index"), {"page": 2}
+        )
+        self.assertEqual(response.context["page_obj"].number, 2)
+        self.assertEqual(
+            len(response.context["page_obj"]),
+            len(PaginatorViewsTest.posts) - POSTS_PER_PAGE,
+        )
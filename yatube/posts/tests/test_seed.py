@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, Tag, TimelineEntry, User
+
+
+class SeedCommandTest(TestCase):
+    OPTIONS = {
+        "users": 30,
+        "groups": 3,
+        "tags": 10,
+        "posts": 200,
+        "comments": 300,
+        "follows": 100,
+        "chunk_size": 70,
+    }
+
+    def seed(self, *args, **options):
+        call_command(
+            "seed", *args, **self.OPTIONS, **options, stdout=StringIO()
+        )
+
+    def clear(self):
+        for model in (User, Group, Tag):
+            model.objects.all().delete()
+
+    def snapshot(self):
+        return (
+            list(
+                User.objects.order_by("pk").values_list(
+                    "first_name", "password", "date_joined"
+                )
+            ),
+            list(
+                Post.objects.order_by("pk").values_list(
+                    "author__username", "text", "created"
+                )
+            ),
+            list(
+                Follow.objects.order_by("pk").values_list(
+                    "user__username", "author__username"
+                )
+            ),
+        )
+
+    def test_row_counts(self):
+        """Команда создаёт запрошенное число строк"""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 100)
+
+    def test_same_seed_same_data(self):
+        """Одно и то же зерно даёт одни и те же данные"""
+        self.seed(seed=1)
+        first = self.snapshot()
+        self.clear()
+        self.seed(seed=1)
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        self.seed(seed=2)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_now(self):
+        """Даты постов отсчитываются назад от --now"""
+        self.seed("--now=2020-06-01")
+        latest = Post.objects.latest("created").created
+        self.assertLess(latest.isoformat(), "2020-06-01")
+        self.assertGreater(latest.isoformat(), "2019-06-01")
+
+    def test_denormalized_data(self):
+        """Счётчики и ленты подписок согласованы с данными"""
+        self.seed()
+        for user in User.objects.annotate(
+            posts_total=Count("posts", distinct=True),
+            followers_total=Count("following", distinct=True),
+        ).select_related("counters"):
+            with self.subTest(user=user.username):
+                self.assertEqual(user.counters.posts_count, user.posts_total)
+                self.assertEqual(
+                    user.counters.followers_count, user.followers_total
+                )
+        expected = sum(
+            Post.objects.filter(author=follow.author).count()
+            for follow in Follow.objects.all()
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        entry = TimelineEntry.objects.select_related("post").first()
+        self.assertEqual(entry.created, entry.post.created)
@@ -0,0 +1,177 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import posts_for
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username="author")
+        cls.another_author = User.objects.create_user(username="another")
+        cls.follower = User.objects.create_user(username="follower")
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text="Пост до подписки",
+        )
+        cls.another_post = Post.objects.create(
+            author=cls.another_author,
+            text="Пост другого автора",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.author.delete()
+        cls.another_author.delete()
+        cls.follower.delete()
+        super().tearDownClass()
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)), [TimelineTest.post]
+        )
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков, начиная сверху"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        new_post = Post.objects.create(
+            author=TimelineTest.author,
+            text="Новый пост",
+        )
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)),
+            [new_post, TimelineTest.post],
+        )
+
+    def test_fan_out_adds_only_new_post(self):
+        """Новый пост добавляет в ленту подписчика ровно одну запись"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        for num in range(4):
+            Post.objects.create(author=TimelineTest.author, text=f"Пост {num}")
+        TimelineEntry.objects.all().delete()
+
+        post = Post.objects.create(
+            author=TimelineTest.author, text="Новый пост"
+        )
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(
+                    user=TimelineTest.follower
+                ).values_list("post", flat=True)
+            ),
+            [post.pk],
+        )
+
+    @override_settings(BACKGROUND_TASKS_ASYNC=True)
+    def test_fan_out_after_commit(self):
+        """В фоновом режиме пост раздаётся подписчикам только после коммита"""
+        # TestCase never commits, so the deferred tasks never run.
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        Post.objects.create(author=TimelineTest.author, text="Новый пост")
+        self.assertEqual(list(posts_for(TimelineTest.follower)), [])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает из ленты посты только этого автора"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        Follow.objects.create(
+            author=TimelineTest.another_author, user=TimelineTest.follower
+        )
+        Follow.objects.filter(
+            author=TimelineTest.author, user=TimelineTest.follower
+        ).delete()
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)),
+            [TimelineTest.another_post],
+        )
+
+    def test_late_backfill_after_unfollow(self):
+        """Подписка, отменённая до заполнения ленты, её не заполняет"""
+        with override_settings(BACKGROUND_TASKS_ASYNC=True):
+            follow = Follow.objects.create(
+                author=TimelineTest.author, user=TimelineTest.follower
+            )
+            follow.delete()
+
+        timeline.prune(TimelineTest.follower.pk, TimelineTest.author.pk)
+        timeline.backfill(TimelineTest.follower.pk, TimelineTest.author.pk)
+        self.assertEqual(list(posts_for(TimelineTest.follower)), [])
+
+    def test_late_prune_after_refollow(self):
+        """Запоздавшая отписка не чистит ленту после новой подписки"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+
+        timeline.prune(TimelineTest.follower.pk, TimelineTest.author.pk)
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)), [TimelineTest.post]
+        )
+
+    def test_late_fan_out_after_unfollow(self):
+        """Пост не попадает в ленту подписчика, отписавшегося до раздачи"""
+        follow = Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        with override_settings(BACKGROUND_TASKS_ASYNC=True):
+            post = Post.objects.create(
+                author=TimelineTest.author, text="Новый пост"
+            )
+            follow.delete()
+
+        timeline.fan_out(post.pk)
+        self.assertNotIn(post, posts_for(TimelineTest.follower))
+
+    def test_author_change_moves_post(self):
+        """Пост со сменённым автором переходит к подписчикам нового автора"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        another_follower = User.objects.create_user(username="another_fan")
+        Follow.objects.create(
+            author=TimelineTest.another_author, user=another_follower
+        )
+        post = Post.objects.create(
+            author=TimelineTest.author, text="Новый пост"
+        )
+
+        post.author = TimelineTest.another_author
+        post.save()
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)), [TimelineTest.post]
+        )
+        self.assertEqual(
+            list(posts_for(another_follower)),
+            [post, TimelineTest.another_post],
+        )
+        another_follower.delete()
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам"""
+        Follow.objects.create(
+            author=TimelineTest.author, user=TimelineTest.follower
+        )
+        TimelineEntry.objects.all().delete()
+
+        call_command("rebuild_timelines", stdout=StringIO())
+
+        self.assertEqual(
+            list(posts_for(TimelineTest.follower)), [TimelineTest.post]
+        )
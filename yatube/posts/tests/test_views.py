@@ -1,8 +1,10 @@
+from core.queries import assert_query_budget
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
-from django.urls import reverse
+from django.test import Client, TestCase, override_settings
+from django.urls import resolve, reverse
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
 
 
 class PostPagesTest(TestCase):
@@ -137,3 +139,65 @@ class PostPagesTest(TestCase):
         first_post = response.context.get("post")
         with self.subTest(name=reverse_name):
             self.assertTrue(hasattr(first_post, "image"))
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username="test_user")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.user.delete()
+        cls.author.delete()
+        cls.group.delete()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def create_posts(self, count):
+        for num in range(count):
+            post = Post.objects.create(
+                text=f"Пост №{num}", author=self.author, group=self.group
+            )
+            Comment.objects.create(post=post, author=self.user, text="Да")
+        return post
+
+    def assert_pages_fit_budget(self, client, post):
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.author}),
+            reverse("posts:post_detail", kwargs={"post_id": post.pk}),
+            reverse("posts:follow_index"),
+            reverse("posts:post_edit", kwargs={"post_id": post.pk}),
+            reverse("post_create"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with assert_query_budget(resolve(url).func.query_budget):
+                    client.get(url)
+
+    def test_views_fit_query_budget(self):
+        """Число запросов страниц не зависит от числа постов"""
+        clients = {"guest": Client(), "user": Client(), "author": Client()}
+        clients["user"].force_login(self.user)
+        clients["author"].force_login(self.author)
+        for pagination in ("cursor", "numbers"):
+            for count in (1, 15):
+                post = self.create_posts(count)
+                for name, client in clients.items():
+                    with self.subTest(pagination=pagination, client=name):
+                        with override_settings(FEED_PAGINATION=pagination):
+                            self.assert_pages_fit_budget(client, post)
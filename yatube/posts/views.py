@@ -1,5 +1,13 @@
+from typing import Optional, Sequence
+
+from core import caching
+from core.decorators import anonymous_cache
+from core.paginators import CursorPaginator
+from core.queries import query_budget
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import QuerySet
 from django.forms import SlugField
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
@@ -9,52 +17,112 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import counters, timeline
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .pagination import PostCursorPagination
 from .serializers import PostSerializer
 
 POSTS_PER_PAGE = 10
+# Relations rendered for every post by includes/post_list.html.
+FEED_RELATED = ("author", "group")
+
+
+def paginate(
+    request: HttpRequest,
+    posts: QuerySet,
+    ordering: Sequence[str] = ("-created", "-pk"),
+    count: Optional[int] = None,
+) -> Page:
+    """Return the requested page of a feed.
+
+    Feeds are paginated with keyset cursors (``?cursor=``) unless
+    ``FEED_PAGINATION`` is set to ``"numbers"`` (``?page=N``). A known
+    *count* spares the page-number paginator its ``COUNT(*)`` query.
+    """
+    if settings.FEED_PAGINATION == "numbers":
+        paginator = Paginator(posts.order_by(*ordering), POSTS_PER_PAGE)
+        if count is not None:
+            paginator.count = count
+        return paginator.get_page(request.GET.get("page"))
+
+    paginator = CursorPaginator(posts, POSTS_PER_PAGE, ordering)
+    return paginator.get_page(request.GET.get("cursor"))
+
+
+def feed_cache(
+    request: HttpRequest, name: str, namespaces: Sequence[str], *vary_on
+) -> dict:
+    """Context of the ``fragment_cache`` of the requested feed page."""
+    return {
+        "cache_key": caching.make_key(
+            f"feed:{name}",
+            namespaces,
+            settings.FEED_PAGINATION,
+            request.GET.get("cursor"),
+            request.GET.get("page"),
+            *vary_on,
+        ),
+        "cache_namespaces": namespaces,
+    }
 
 
+@query_budget(4)
+@anonymous_cache(lambda request: ["posts", "users"])
 def index(request: HttpRequest) -> HttpResponse:
     template = "posts/index.html"
-    posts = Post.objects.all()
+    posts = Post.objects.select_related(*FEED_RELATED)
 
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts)
 
     context = {
         "title": "Последние обновления на сайте",
         "page_obj": page_obj,
+        **feed_cache(request, "index", ["posts", "users"]),
         "index": True,
     }
 
     return render(request, template, context)
 
 
+@query_budget(4)
+@anonymous_cache(lambda request, slug: ["posts", "groups", "users"])
 def group_posts(request: HttpRequest, slug: SlugField) -> HttpResponse:
     """To view posts in certain community"""
     template = "posts/group_list.html"
-    group = get_object_or_404(Group, slug=slug)
+    group = caching.get_or_set(
+        "group",
+        ["groups", "posts"],
+        lambda: get_object_or_404(Group, slug=slug),
+        slug,
+    )
 
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related(*FEED_RELATED).filter(group=group)
+    page_obj = paginate(request, posts, count=group.posts_count)
 
     context = {
         "group": group,
         "page_obj": page_obj,
+        **feed_cache(request, "group", ["posts", "users"], group.pk),
     }
 
     return render(request, template, context)
 
 
+@query_budget(5)
+@anonymous_cache(lambda request, username: ["posts", "users"])
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """To view user profile and his posts"""
     template = "posts/profile.html"
-    author = get_object_or_404(User, username=username)
+    author = caching.get_or_set(
+        "user",
+        ["users", "posts"],
+        lambda: get_object_or_404(
+            User.objects.select_related("counters").defer("password"),
+            username=username,
+        ),
+        username,
+    )
 
     following = (
         request.user.is_authenticated
@@ -63,26 +131,32 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
         ).exists()
     )
 
-    posts = Post.objects.filter(author=author)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts_count = counters.get_counters(author).posts_count
+    posts = Post.objects.select_related(*FEED_RELATED).filter(author=author)
+    page_obj = paginate(request, posts, count=posts_count)
 
     context = {
         "username": author,
-        "posts_count": posts.count(),
+        "posts_count": posts_count,
         "page_obj": page_obj,
+        **feed_cache(request, "profile", ["posts", "users"], author.pk),
         "following": following,
     }
     return render(request, template, context)
 
 
+@query_budget(4)
+@anonymous_cache(
+    lambda request, post_id: ["posts", "users", f"comments:{post_id}"]
+)
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """To view single post"""
     template = "posts/post_detail.html"
-    post = get_object_or_404(Post, id=post_id)
-    posts_count = Post.objects.filter(author=post.author).count()
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related("author__counters", "group"), id=post_id
+    )
+    posts_count = counters.get_counters(post.author).posts_count
+    comments = Comment.objects.select_related("author").filter(post=post)
 
     context = {
         "post": post,
@@ -93,6 +167,7 @@ def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     return render(request, template, context)
 
 
+@query_budget(3)
 @login_required
 def post_create(request: HttpRequest) -> HttpResponse:
     """Creates a new post"""
@@ -118,6 +193,7 @@ def post_create(request: HttpRequest) -> HttpResponse:
     return render(request, template, context)
 
 
+@query_budget(5)
 def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
     """Edit a post"""
     template = "posts/create_post.html"
@@ -158,19 +234,24 @@ def add_comment(request: HttpRequest, post_id: int) -> HttpResponse:
     return redirect("posts:post_detail", post_id=post_id)
 
 
+@query_budget(4)
 @login_required
 def follow_index(request):
     """View posts of subscribed authors"""
     template = "posts/index.html"
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = timeline.posts_for(request.user).select_related(*FEED_RELATED)
 
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts, timeline.ORDERING)
 
     context = {
         "title": "Сообщения авторов, на которых вы подписаны",
         "page_obj": page_obj,
+        **feed_cache(
+            request,
+            "follow",
+            ["posts", "users", "timelines", f"timeline:{request.user.pk}"],
+            request.user.pk,
+        ),
         "follow": True,
     }
     return render(request, template, context)
@@ -202,10 +283,15 @@ def profile_unfollow(request, username):
     return redirect("posts:profile", username=author)
 
 
+def api_posts_queryset() -> QuerySet:
+    """Posts with the relations ``PostSerializer`` renders."""
+    return PostSerializer.setup_eager_loading(Post.objects.all())
+
+
 @api_view(["GET", "PUT", "PATCH", "DELETE"])
 def api_posts_detail(request: Request, pk: int) -> Response:
     try:
-        post = Post.objects.get(pk=pk)
+        post = api_posts_queryset().get(pk=pk)
     except Post.DoesNotExist:
         return Response(
             {"detail": f"Post id={pk} does not exists"},
@@ -236,16 +322,20 @@ def api_posts(request: Request) -> Response:
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    posts = Post.objects.all()
+    paginator = PostCursorPagination()
+    posts = paginator.paginate_queryset(api_posts_queryset(), request)
     serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return paginator.get_paginated_response(serializer.data)
 
 
 class APIPost(APIView):
     def get(self, request: Request) -> Response:
-        posts = Post.objects.all()
+        paginator = PostCursorPagination()
+        posts = paginator.paginate_queryset(
+            api_posts_queryset(), request, self
+        )
         serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request: Request) -> Response:
         serializer = PostSerializer(data=request.data)
@@ -258,7 +348,7 @@ class APIPost(APIView):
 class APIPostDetail(APIView):
     def get(self, request: Request, pk: int) -> Response:
         try:
-            post = Post.objects.get(pk=pk)
+            post = api_posts_queryset().get(pk=pk)
         except Post.DoesNotExist:
             return Response(
                 {"detail": f"Post id={pk} does not exists"},
@@ -269,7 +359,7 @@ class APIPostDetail(APIView):
 
     def put(self, request: Request, pk: int) -> Response:
         try:
-            post = Post.objects.get(pk=pk)
+            post = api_posts_queryset().get(pk=pk)
         except Post.DoesNotExist:
             return Response(
                 {"detail": f"Post id={pk} does not exists"},
@@ -285,7 +375,7 @@ class APIPostDetail(APIView):
 
     def patch(self, request: Request, pk: int) -> Response:
         try:
-            post = Post.objects.get(pk=pk)
+            post = api_posts_queryset().get(pk=pk)
         except Post.DoesNotExist:
             return Response(
                 {"detail": f"Post id={pk} does not exists"},
@@ -312,15 +402,15 @@ class APIPostDetail(APIView):
 
 
 class APIPostList(generics.ListCreateAPIView):
-    queryset = Post.objects.all()
+    queryset = api_posts_queryset()
     serializer_class = PostSerializer
 
 
 class APIPostDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+    queryset = api_posts_queryset()
     serializer_class = PostSerializer
 
 
 class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+    queryset = api_posts_queryset()
     serializer_class = PostSerializer
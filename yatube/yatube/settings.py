@@ -1,10 +1,16 @@
 import os
+import sys
+import tempfile
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# ``manage.py test`` and pytest, which must keep off the data of the site.
+TESTING = sys.argv[1:2] == ["test"] or "pytest" in sys.modules
+
 SECRET_KEY = "l335(w#)_naxnthuk(owxj6w8hjbm8g=sr#8bkm3w26790w_0u"
 
 DEBUG = False
@@ -31,6 +37,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the total covers the other middleware too.
+    "core.middleware.server_timing.ServerTimingMiddleware",
+    "core.middleware.slow_queries.SlowQueryMiddleware",
+    "core.middleware.replicas.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -38,14 +48,19 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Fails pages over their query budget, only with DEBUG on.
+    "core.middleware.query_budget.QueryBudgetMiddleware",
+    "core.middleware.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
 
+TEST_RUNNER = "core.testing.TestRunner"
+
 PROJECT_TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.backends.templates.TimedDjangoTemplates",
         "DIRS": [PROJECT_TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -70,9 +85,33 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Counters are updated by signals, keep them in the same transaction.
+        'ATOMIC_REQUESTS': True,
     }
 }
 
+# Read replicas of the primary, comma separated: database files for
+# SQLite, hosts otherwise. See core.db_router.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), 1
+):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME" if "sqlite3" in DATABASES["default"]["ENGINE"] else "HOST": (
+            replica.strip()
+        ),
+        # Nothing is written there, and tests use the primary instead.
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+# Reads of a client who has just written stay on the primary this long.
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+REPLICA_STICKY_COOKIE = "primary"
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -111,9 +150,166 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
 
+# Each worker keeps hot keys in memory for a couple of seconds in front
+# of one SQLite (WAL) cache file shared by all worker processes of a host.
 CACHES = {
     "default": {
         # "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        "BACKEND": "core.backends.tiered_cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "L1_TIMEOUT": int(os.getenv("CACHE_L1_TIMEOUT", "2")),
+            "L1_MAX_ENTRIES": int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000")),
+        },
+    },
+    "shared": {
+        "BACKEND": "core.backends.sqlite_cache.SQLiteCache",
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", os.path.join(BASE_DIR, "var", "cache.sqlite3")
+        ),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "100000")),
+        },
+    }
+}
+if TESTING:
+    # Tests clear and fill the cache freely, keep them off the site's file.
+    CACHES["shared"] = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests",
     }
+# Versioned entries (fragments, hot rows) are invalidated by writes
+# (see core.caching), the timeout only bounds how long unused ones stay.
+VERSIONED_CACHE_TIMEOUT = 60 * 60
+# Release the versioned entries and ETags belong to, e.g. the deployed
+# commit; a digest of the templates when empty.
+CACHE_VERSION = os.getenv("CACHE_VERSION", "")
+
+# Deferred work (timeline fan-out) runs in a thread pool after commit;
+# with BACKGROUND_TASKS_ASYNC=0, and in tests (core.testing), it runs
+# inline with the request that asked for it.
+BACKGROUND_TASKS_ASYNC = os.getenv("BACKGROUND_TASKS_ASYNC", "1") == "1"
+BACKGROUND_TASKS_WORKERS = int(os.getenv("BACKGROUND_TASKS_WORKERS", "2"))
+
+# "cursor" for keyset pagination of feeds, "numbers" for ?page=N links.
+FEED_PAGINATION = os.getenv("FEED_PAGINATION", "cursor")
+
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "posts.pagination.PostCursorPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "20")),
+}
+# Hard limit for the ?page_size= parameter of API listings.
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "100"))
+
+# SQL, cache and template time of each request (core.timing) goes to the
+# Server-Timing header and, at INFO level, to the log.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "1") == "1"
+# Slow requests are profiled (core.profiling): stacks of a
+# PROFILING_SAMPLE_RATE share of requests are sampled every
+# PROFILING_INTERVAL_MS and kept when it takes longer than
+# PROFILING_SLOW_MS (0 turns profiling off); the next request of a slow
+# view runs under cProfile, at most once per PROFILING_COOLDOWN seconds.
+PROFILING_SLOW_MS = int(os.getenv("PROFILING_SLOW_MS", "1000"))
+PROFILING_INTERVAL_MS = int(os.getenv("PROFILING_INTERVAL_MS", "50"))
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1"))
+PROFILING_COOLDOWN = int(os.getenv("PROFILING_COOLDOWN", "60"))
+PROFILING_DIR = os.getenv(
+    "PROFILING_DIR", os.path.join(BASE_DIR, "var", "profiles")
+)
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "200"))
+
+# Counts generated thumbnails in core.metrics.
+THUMBNAIL_BACKEND = "core.backends.thumbnail.ThumbnailBackend"
+# Geometries and options of the thumbnails shown by the templates, created
+# in the background when an image is saved (core.thumbnails).
+THUMBNAIL_PRESETS = {
+    "post": ("960x339", {"crop": "center", "upscale": True}),
+}
+# Narrower copies of each preset for srcset, in these formats besides the
+# one of the source (when Pillow can write them).
+THUMBNAIL_SRCSET_WIDTHS = (320, 480, 720)
+THUMBNAIL_SRCSET_FORMATS = ("WEBP",)
+THUMBNAIL_PRESERVE_FORMAT = True
+
+# Uploads stream to temporary files, those over the limit are rejected
+# (core.uploads), so big uploads don't take the memory of the workers.
+FILE_UPLOAD_HANDLERS = ["core.uploads.CappedUploadHandler"]
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 2**20))
+# Uploaded images (core.images): other formats and larger ones are
+# rejected, the rest are scaled down to fit the side and re-encoded (JPEG
+# or WEBP).
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv("IMAGE_UPLOAD_MAX_PIXELS", "50000000")
+)
+IMAGE_UPLOAD_MAX_SIDE = int(os.getenv("IMAGE_UPLOAD_MAX_SIDE", "2560"))
+# Images are decoded inside the request: after JPEG draft decoding this
+# many pixels at most (64 MB as RGBA), larger PNG and WebP are rejected.
+IMAGE_NORMALIZE_MAX_PIXELS = int(
+    os.getenv("IMAGE_NORMALIZE_MAX_PIXELS", "16000000")
+)
+IMAGE_UPLOAD_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+IMAGE_UPLOAD_FORMAT = os.getenv("IMAGE_UPLOAD_FORMAT", "JPEG")
+IMAGE_UPLOAD_QUALITY = int(os.getenv("IMAGE_UPLOAD_QUALITY", "85"))
+# Thumbnail lookups are kept in the worker's memory too.
+THUMBNAIL_KVSTORE = "core.backends.thumbnail_kvstore.KVStore"
+THUMBNAIL_LRU_SIZE = int(os.getenv("THUMBNAIL_LRU_SIZE", "5000"))
+THUMBNAIL_LRU_TIMEOUT = int(os.getenv("THUMBNAIL_LRU_TIMEOUT", "300"))
+
+# Prometheus metrics (core.metrics): files of the worker processes, summed
+# by /metrics. It answers staff users, requests with the header
+# "Authorization: Bearer <METRICS_TOKEN>" and the listed addresses, none
+# by default: behind a proxy every request comes from 127.0.0.1.
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(BASE_DIR, "var", "metrics")
+)
+if TESTING:
+    METRICS_DIR = os.path.join(tempfile.gettempdir(), "yatube-test-metrics")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = list(
+    filter(None, os.getenv("METRICS_ALLOWED_IPS", "").split(","))
+)
+
+# Queries slower than SLOW_QUERY_MS (0 turns the log off) and SQL run
+# SLOW_QUERY_REPEATS times in one request go to a rotating JSON log, with
+# the view and code that ran them (core.slow_queries).
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_REPEATS = int(os.getenv("SLOW_QUERY_REPEATS", "10"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+# Query parameters hold session keys, password hashes and emails: logged
+# only when debugging. PostgreSQL plans (SLOW_QUERY_EXPLAIN) show them too.
+SLOW_QUERY_LOG_PARAMS = os.getenv("SLOW_QUERY_LOG_PARAMS", "0") == "1"
+SLOW_QUERY_LOG = os.getenv(
+    "SLOW_QUERY_LOG", os.path.join(BASE_DIR, "var", "slow_queries.log")
+)
+if TESTING:
+    SLOW_QUERY_LOG = os.path.join(
+        tempfile.gettempdir(), "yatube-test-slow_queries.log"
+    )
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+        "slow_queries": {
+            "class": "core.slow_queries.LogHandler",
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "formatter": "message",
+        },
+    },
+    "loggers": {
+        "core.middleware.server_timing": {
+            "handlers": ["console"],
+            "level": os.getenv("SERVER_TIMING_LOG_LEVEL", "WARNING"),
+        },
+        "core.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
 }
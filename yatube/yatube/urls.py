@@ -1,3 +1,4 @@
+from core.views import metrics
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -11,6 +12,7 @@ urlpatterns = [
     path("auth/", include("django.contrib.auth.urls")),
     path("admin/", admin.site.urls),
     path("create/", post_create, name="post_create"),
+    path("metrics", metrics, name="metrics"),
 ]
 
 handler403 = "core.views.handler403"